@@ -0,0 +1,26 @@
+import functools
+import os
+
+# Folder that the images are in, so that they are found no matter which folder the program is run from.
+ASSETS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def get_pygame():
+    """
+    Import pygame, for drawing. It is only imported when something is first drawn, so that planning without a display
+    never needs it.
+    """
+    import pygame
+    return pygame
+
+
+@functools.lru_cache(maxsize=None)
+def load_image(name, size):
+    """
+    Load an image from the assets folder, scaled to the specified size.
+
+    Each image is only loaded when it is first drawn, and then shared. This means that planning without a display never
+    imports pygame or decodes any images.
+    """
+    pygame = get_pygame()
+    return pygame.transform.scale(pygame.image.load(os.path.join(ASSETS_DIR, name)), size)
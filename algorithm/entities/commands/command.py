@@ -5,18 +5,52 @@ from algorithm import settings
 
 
 class Command(ABC):
+    """
+    Commands cannot be changed after they are created, and two commands of the same type created with the same
+    arguments are equal. So the same command objects can be shared by many paths, and a copy of a command (such as one
+    sent from another process) is still found in PRIMITIVES. The progress of carrying out a command is tracked
+    separately by a CommandCursor.
+    """
+    __slots__ = ("time", "total_ticks")
+
     def __init__(self, time):
-        self.time = time  # Time in seconds in which this command is carried out.
-        self.ticks = math.ceil(time * settings.FRAMES)  # Number of frame ticks that this command will take.
-        self.total_ticks = self.ticks  # Keep track of original total ticks.
+        # Time in seconds in which this command is carried out, and the number of frame ticks that it will take.
+        self._set("time", time)
+        self._set("total_ticks", math.ceil(time * settings.FRAMES))
+
+    def _set(self, name, value):
+        # Only used while the command is being created.
+        object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} cannot be changed after it is created!")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} cannot be changed after it is created!")
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.get_args() == other.get_args()
+
+    def __hash__(self):
+        return hash((type(self), self.get_args()))
 
-    def tick(self):
-        self.ticks -= 1
+    def __reduce__(self):
+        # Copies are made again from the arguments, as the attributes cannot be set on them one by one.
+        return type(self), self.get_args()
 
     @abstractmethod
-    def process_one_tick(self, robot):
+    def get_args(self):
         """
-        Overriding method must call tick().
+        Get the arguments that this command was created with, in the same order as its constructor takes them.
+        """
+        pass
+
+    @abstractmethod
+    def process_one_tick(self, robot, cursor):
+        """
+        Carry out one tick of this command on the robot.
+
+        Overriding method must call cursor.tick().
         """
         pass
 
@@ -0,0 +1,27 @@
+from algorithm.entities.commands.command import Command
+
+
+class CommandCursor:
+    """
+    Keeps track of how far the simulator is in carrying out a command.
+
+    Commands themselves are never changed while being carried out, so the same command object can be shared by
+    many paths (and by the path finder) at once.
+    """
+    def __init__(self, command: Command):
+        self.command = command
+        self.ticks = command.total_ticks  # Number of frame ticks left to carry out.
+
+    def __str__(self):
+        return f"CommandCursor({self.command}, {self.ticks} ticks left)"
+
+    __repr__ = __str__
+
+    def tick(self):
+        self.ticks -= 1
+
+    def done(self):
+        return self.ticks <= 0
+
+    def process_one_tick(self, robot):
+        self.command.process_one_tick(robot, self)
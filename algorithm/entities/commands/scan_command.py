@@ -2,20 +2,25 @@ from algorithm.entities.commands.command import Command
 
 
 class ScanCommand(Command):
+    __slots__ = ("obj_index",)
+
     def __init__(self, time, obj_index):
         super().__init__(time)
-        self.obj_index = obj_index
+        self._set("obj_index", obj_index)
 
     def __str__(self):
         return f"ScanCommand(time={self.time, self.obj_index})"
 
     __repr__ = __str__
 
-    def process_one_tick(self, robot):
+    def get_args(self):
+        return self.time, self.obj_index
+
+    def process_one_tick(self, robot, cursor):
         if self.total_ticks == 0:
             return
 
-        self.tick()
+        cursor.tick()
 
     def apply_on_pos(self, curr_pos):
         pass
@@ -5,6 +5,8 @@ from algorithm.entities.grid.position import Position
 
 
 class StraightCommand(Command):
+    __slots__ = ("dist",)
+
     def __init__(self, dist):
         """
         Specified distance is scaled. Do not divide the provided distance by the scaling factor!
@@ -13,18 +15,21 @@ class StraightCommand(Command):
         time = abs(dist / settings.ROBOT_SPEED_PER_SECOND)
         super().__init__(time)
 
-        self.dist = dist
+        self._set("dist", dist)
 
     def __str__(self):
         return f"StraightCommand(dist={self.dist / settings.SCALING_FACTOR}, {self.total_ticks} ticks)"
 
     __repr__ = __str__
 
-    def process_one_tick(self, robot):
+    def get_args(self):
+        return self.dist,
+
+    def process_one_tick(self, robot, cursor):
         if self.total_ticks == 0:
             return
 
-        self.tick()
+        cursor.tick()
         distance = self.dist / self.total_ticks
         robot.straight(distance)
 
@@ -7,6 +7,8 @@ from algorithm.entities.grid.position import Position, RobotPosition
 
 
 class TurnCommand(Command):
+    __slots__ = ("angle", "rev")
+
     def __init__(self, angle, rev):
         """
         Angle to turn and whether the turn is done in reverse or not. Note that this is in degrees.
@@ -17,19 +19,22 @@ class TurnCommand(Command):
                    (settings.ROBOT_SPEED_PER_SECOND * settings.ROBOT_S_FACTOR))
         super().__init__(time)
 
-        self.angle = angle
-        self.rev = rev
+        self._set("angle", angle)
+        self._set("rev", rev)
 
     def __str__(self):
         return f"TurnCommand({self.angle:.2f}degrees, {self.total_ticks} ticks, rev={self.rev})"
 
     __repr__ = __str__
 
-    def process_one_tick(self, robot):
+    def get_args(self):
+        return self.angle, self.rev
+
+    def process_one_tick(self, robot, cursor):
         if self.total_ticks == 0:
             return
 
-        self.tick()
+        cursor.tick()
         angle = self.angle / self.total_ticks
         robot.turn(angle, self.rev)
 
@@ -0,0 +1,124 @@
+import socket
+import struct
+from typing import List, Optional, Tuple
+
+# Every message starts with a header of its type and the length of the rest of the message, in bytes.
+HEADER = struct.Struct("!BI")
+MESSAGE_OBSTACLES = 1
+MESSAGE_COMMANDS = 2
+# Longest message that is accepted, in bytes. Anything longer is treated as a broken header, rather than allocating
+# a buffer for it.
+MAX_MESSAGE_LENGTH = 1 << 20
+
+# One obstacle: x, y, direction of its image (in degrees) and index. Same order as main.parse_obstacle_data takes.
+OBSTACLE = struct.Struct("!HHhH")
+# One command: its opcode, which is the letter that starts its string message (e.g. "f" for forward), and the number
+# after that letter.
+COMMAND = struct.Struct("!cH")
+
+
+def pack_obstacles(obstacle_data) -> bytes:
+    return b"".join(OBSTACLE.pack(x, y, direction, index) for x, y, direction, index in obstacle_data)
+
+
+def check_records(payload, record: struct.Struct):
+    """
+    Raise a ValueError if the payload is not a whole number of records.
+    """
+    if len(payload) % record.size != 0:
+        raise ValueError(f"Payload of {len(payload)} bytes is not a whole number of {record.size}-byte records!")
+
+
+def unpack_obstacles(payload) -> List[List[int]]:
+    check_records(payload, OBSTACLE)
+    return [list(obstacle) for obstacle in OBSTACLE.iter_unpack(payload)]
+
+
+def pack_commands(messages: List[str]) -> bytes:
+    """
+    Pack the string messages of commands (e.g. "f0090") into command records.
+    """
+    return b"".join(COMMAND.pack(message[0].encode(), int(message[1:])) for message in messages)
+
+
+def unpack_commands(payload) -> List[Tuple[str, int]]:
+    """
+    Get the (opcode, argument) of every command record.
+    """
+    check_records(payload, COMMAND)
+    return [(opcode.decode(), argument) for opcode, argument in COMMAND.iter_unpack(payload)]
+
+
+class Connection:
+    """
+    Messages sent both ways over a connected socket, framed so that the socket can be kept open for many messages.
+
+    Messages are read into a single buffer that is reused for every message, and only grows when a message is bigger
+    than any before it.
+    """
+    def __init__(self, sock: socket.socket, buffer_size=4096):
+        self.socket = sock
+        self.buffer = bytearray(buffer_size)
+
+    def send(self, message_type, payload: bytes):
+        self.socket.sendall(HEADER.pack(message_type, len(payload)) + payload)
+
+    def receive(self) -> Optional[Tuple[int, memoryview]]:
+        """
+        Wait for the next message, and get its (type, payload). Gets None if the other side closed the connection
+        instead.
+
+        The payload is a view into the buffer, so it is only valid until the next message is received.
+        """
+        if not self.receive_exactly(HEADER.size, True):
+            return None
+        message_type, length = HEADER.unpack_from(self.buffer)
+        if length > MAX_MESSAGE_LENGTH:
+            raise ValueError(f"Message of {length} bytes is longer than the limit of {MAX_MESSAGE_LENGTH} bytes!")
+        if length > len(self.buffer):
+            self.buffer = bytearray(length)
+        self.receive_exactly(length, False)
+        return message_type, memoryview(self.buffer)[:length]
+
+    def receive_exactly(self, size, can_close):
+        """
+        Read exactly size bytes into the start of the buffer. Gets False if the connection was closed before any of
+        them arrived, and can_close is set.
+        """
+        view = memoryview(self.buffer)
+        received = 0
+        while received < size:
+            count = self.socket.recv_into(view[received:size])
+            if count == 0:
+                if received == 0 and can_close:
+                    return False
+                raise ConnectionError("Connection closed in the middle of a message!")
+            received += count
+        return True
+
+    def receive_expected(self, expected_type):
+        """
+        Wait for the next message, which must be of the specified type, and get its payload. Gets None if the other
+        side closed the connection instead.
+        """
+        message = self.receive()
+        if message is None:
+            return None
+        message_type, payload = message
+        if message_type != expected_type:
+            raise ValueError(f"Expected a message of type {expected_type}, but got type {message_type}!")
+        return payload
+
+    def send_obstacles(self, obstacle_data):
+        self.send(MESSAGE_OBSTACLES, pack_obstacles(obstacle_data))
+
+    def receive_obstacles(self) -> Optional[List[List[int]]]:
+        payload = self.receive_expected(MESSAGE_OBSTACLES)
+        return None if payload is None else unpack_obstacles(payload)
+
+    def send_commands(self, messages: List[str]):
+        self.send(MESSAGE_COMMANDS, pack_commands(messages))
+
+    def receive_commands(self) -> Optional[List[Tuple[str, int]]]:
+        payload = self.receive_expected(MESSAGE_COMMANDS)
+        return None if payload is None else unpack_commands(payload)
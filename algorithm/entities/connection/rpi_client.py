@@ -1,21 +1,37 @@
-import pickle
 import socket
 
+from algorithm.entities.connection.protocol import Connection
+
 
 class RPiClient:
     """
-    Used for connecting to...
+    Used by the PC to connect to the RPi. The connection is kept open, so that the RPi can send many obstacle layouts
+    over it, and get the commands for each of them back.
     """
     def __init__(self, host, port):
         self.host = host
         self.port = port
         self.socket = socket.socket()
+        self.connection = None
 
     def connect(self):
         self.socket.connect((self.host, self.port))
+        self.connection = Connection(self.socket)
+
+    def receive_obstacles(self):
+        """
+        Wait for the RPi to send an obstacle layout, as a list of [x, y, direction, index]. Gets None if the RPi closed
+        the connection instead.
+        """
+        assert self.connection is not None
+        return self.connection.receive_obstacles()
 
-    def send_message(self, obj):
-        self.socket.sendall(pickle.dumps(obj))
+    def send_commands(self, commands):
+        """
+        Send the string messages of the commands for the last obstacle layout.
+        """
+        assert self.connection is not None
+        self.connection.send_commands(commands)
 
     def close(self):
         self.socket.close()
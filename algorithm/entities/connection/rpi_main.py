@@ -1,7 +1,6 @@
 import sys
 
-from rpi_client import RPiClient
-from rpi_server import RPiServer
+from algorithm.entities.connection.rpi_server import RPiServer
 
 
 def main():
@@ -17,43 +16,18 @@ def main():
         sys.exit(1)
     print("Connection from PC established!\n")
 
-    # Then, we use this to connect to the PC's server.
-    host = server.address[0]
-    # Create a client to connect to the PC's server.
+    # The same connection is used both ways, and can be kept open for as many layouts as needed.
     try:
-        client = RPiClient(host, 4161)
-    except OSError as e:
-        print(e)
-        server.close()
-        sys.exit(1)
-
-    # Wait to connect to RPi.
-    print(f"Attempting connection to PC at {host}:{4161}")
-    while True:
-        try:
-            client.connect()
-            break
-        except OSError:
-            pass
-        except Exception as e:
-            print(e)
-            server.close()
-            client.close()
-            sys.exit(1)
-    print("Connected to PC!\n")
-
-    # Send over the obstacle data to the PC.
-    print("Sending obstacle data to PC...")
-    # TODO: Send actual obstacle data to the PC.
-    obstacle_data = [[23, 23, 90], [45, 45, 78]]
-    client.send_message(obstacle_data)
-    client.close()
-    print("Done!\n")
-
-    # Receive commands from the PC.
-    print("Receiving robot commands from PC...")
-    try:
-        commands = server.receive_data()
+        # Send over the obstacle data to the PC.
+        print("Sending obstacle data to PC...")
+        # TODO: Send actual obstacle data to the PC.
+        obstacle_data = [[105, 75, 180, 0], [135, 25, 0, 1]]
+        server.send_obstacles(obstacle_data)
+        print("Done!\n")
+
+        # Receive commands from the PC.
+        print("Receiving robot commands from PC...")
+        commands = server.receive_commands()
         print("Commands received!\n")
         print(commands)
     except Exception as e:
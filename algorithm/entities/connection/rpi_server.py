@@ -1,5 +1,6 @@
 import socket
-import pickle
+
+from algorithm.entities.connection.protocol import Connection
 
 
 class RPiServer:
@@ -11,8 +12,8 @@ class RPiServer:
         self.port = port
         self.socket = socket.socket()
 
-        self.__data = []
         self.conn, self.address = None, None
+        self.connection = None
 
     def start(self):
         print(f"Creating server at {self.host}:{self.port}")
@@ -21,21 +22,23 @@ class RPiServer:
         print("Listening for connection...")
 
         self.conn, self.address = self.socket.accept()
+        self.connection = Connection(self.conn)
         print(f"Connection from {self.address}")
 
-    def receive_data(self):
-        assert self.conn is not None and self.address is not None
-        with self.conn:
-            print(f"Connection from {self.address}")
-            while True:
-                d = self.conn.recv(1024)
-                if not d:
-                    break
-                self.__data.append(d)
+    def send_obstacles(self, obstacle_data):
+        assert self.connection is not None
+        self.connection.send_obstacles(obstacle_data)
 
-        # This may allow arbitrary code execution. Only connect to trusted connections!!!
-        return pickle.loads(b''.join(self.__data))
+    def receive_commands(self):
+        """
+        Wait for the commands for the last obstacle layout sent, as a list of (opcode, argument). Gets None if the PC
+        closed the connection instead.
+        """
+        assert self.connection is not None
+        return self.connection.receive_commands()
 
     def close(self):
         print("Closing socket.")
+        if self.conn is not None:
+            self.conn.close()
         self.socket.close()
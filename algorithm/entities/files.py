@@ -0,0 +1,26 @@
+import os
+import tempfile
+
+
+def write_atomically(path, data):
+    """
+    Write the data (bytes or str) to the file, replacing it in one step.
+
+    The data is first written to a temporary file in the same folder, so that stopping halfway, or another process
+    writing the same file at the same time, never leaves a broken file behind. Raises OSError if it cannot be written.
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    os.makedirs(folder, exist_ok=True)
+    with tempfile.NamedTemporaryFile("wb" if isinstance(data, bytes) else "w", dir=folder, delete=False) as f:
+        temp_path = f.name
+        try:
+            f.write(data)
+        except BaseException:
+            f.close()
+            os.remove(temp_path)
+            raise
+    try:
+        os.replace(temp_path, path)
+    except OSError:
+        os.remove(temp_path)
+        raise
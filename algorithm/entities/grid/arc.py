@@ -0,0 +1,116 @@
+import math
+
+# Tolerance for floating point errors. Points closer than this to a boundary are treated as being on it.
+EPSILON = 1e-6
+
+
+class Arc:
+    """
+    Part of a circle, traced from a start angle through a sweep angle. Used for the path of the robot when turning.
+
+    Angles are in radians, measured counter-clockwise from the positive x-axis. A negative sweep means that the arc is
+    traced clockwise.
+    """
+    __slots__ = ("center_x", "center_y", "radius", "start", "sweep", "_bounds")
+
+    def __init__(self, center_x, center_y, radius, start, sweep):
+        self.center_x = center_x
+        self.center_y = center_y
+        self.radius = radius
+        self.start = start
+        self.sweep = sweep
+        self._bounds = None
+
+    def __str__(self):
+        return f"Arc(center=({self.center_x}, {self.center_y}), radius={self.radius}, " \
+               f"start={math.degrees(self.start):.2f}, sweep={math.degrees(self.sweep):.2f})"
+
+    __repr__ = __str__
+
+    @classmethod
+    def from_turn(cls, start_x, start_y, start_angle, end_x, end_y, radius):
+        """
+        Get the arc traced by a robot turning from a start point to an end point.
+
+        The robot starts facing start_angle (in degrees), so the center of the turn is at a right angle to that
+        direction, on whichever side is the right distance from the end point.
+        """
+        normal_x, normal_y = -math.sin(math.radians(start_angle)), math.cos(math.radians(start_angle))
+        centers = [(start_x + side * radius * normal_x, start_y + side * radius * normal_y) for side in (1, -1)]
+        center_x, center_y = min(centers, key=lambda c: abs(math.dist(c, (end_x, end_y)) - radius))
+
+        start = math.atan2(start_y - center_y, start_x - center_x)
+        end = math.atan2(end_y - center_y, end_x - center_x)
+        # The robot always takes the shorter way around the circle.
+        sweep = (end - start + math.pi) % (2 * math.pi) - math.pi
+        return cls(center_x, center_y, radius, start, sweep)
+
+    def point_at(self, t):
+        """
+        Get the point that is a fraction t of the way along this arc.
+        """
+        angle = self.start + t * self.sweep
+        return self.center_x + self.radius * math.cos(angle), self.center_y + self.radius * math.sin(angle)
+
+    def fraction_of(self, angle):
+        """
+        Get how far along this arc (from 0 to 1) the point at the specified angle is, or None if it is not on the arc.
+        """
+        travelled = ((angle - self.start) * math.copysign(1, self.sweep)) % (2 * math.pi)
+        if travelled > abs(self.sweep) + EPSILON:
+            return None
+        return min(travelled / abs(self.sweep), 1)
+
+    def get_bounds(self):
+        """
+        Get (x_min, y_min, x_max, y_max) of the smallest axis-aligned box that contains this arc.
+        """
+        if self._bounds is not None:
+            return self._bounds
+
+        points = [self.point_at(0), self.point_at(1)]
+        # The arc is furthest out in some axis whenever it passes one of these angles.
+        for quarter in range(4):
+            if self.fraction_of(quarter * math.pi / 2) is not None:
+                points.append(self.point_at(self.fraction_of(quarter * math.pi / 2)))
+        xs, ys = [x for x, _ in points], [y for _, y in points]
+        self._bounds = min(xs), min(ys), max(xs), max(ys)
+        return self._bounds
+
+    def get_line_crossings(self, value, vertical):
+        """
+        Get the fractions along this arc at which it meets the line x = value (if vertical) or y = value.
+        """
+        offset = (value - (self.center_x if vertical else self.center_y)) / self.radius
+        if abs(offset) > 1:
+            return []
+        if vertical:
+            angles = (math.acos(offset), -math.acos(offset))
+        else:
+            angles = (math.asin(offset), math.pi - math.asin(offset))
+        return [t for t in map(self.fraction_of, angles) if t is not None]
+
+    def check_within_box(self, x_min, y_min, x_max, y_max):
+        """
+        Check whether any part of this arc goes strictly inside the specified axis-aligned box.
+
+        Points on the edges of the box do not count as being inside it.
+        """
+        bounds = self.get_bounds()
+        if bounds[2] <= x_min or bounds[0] >= x_max or bounds[3] <= y_min or bounds[1] >= y_max:
+            return False
+
+        # Split the arc at every point where it meets the lines along the edges of the box. Each piece is then either
+        # fully inside or fully outside the box, so we only need to check the middle of each piece.
+        cuts = [0, 1]
+        for x in (x_min, x_max):
+            cuts.extend(self.get_line_crossings(x, True))
+        for y in (y_min, y_max):
+            cuts.extend(self.get_line_crossings(y, False))
+        cuts.sort()
+
+        for a, b in zip(cuts, cuts[1:]):
+            x, y = self.point_at((a + b) / 2)
+            if x_min + EPSILON < x < x_max - EPSILON and y_min + EPSILON < y < y_max - EPSILON:
+                return True
+        return False
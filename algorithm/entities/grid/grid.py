@@ -1,78 +1,164 @@
-import math
-from collections import deque
 from typing import List
 
-import pygame
-
 from algorithm import settings
 from algorithm.entities.assets import colors
+from algorithm.entities.assets.images import get_pygame
 from algorithm.entities.grid.node import Node
 from algorithm.entities.grid.obstacle import Obstacle
+from algorithm.entities.grid.obstacle_index import ObstacleIndex
+from algorithm.entities.grid.occupancy_grid import OccupancyGrid
 from algorithm.entities.grid.position import Position
+from algorithm.entities.grid.state_lattice import StateLattice
 
 
 class Grid:
-    def __init__(self, obstacles: List[Obstacle]):
+    def __init__(self, obstacles: List[Obstacle], num_rows=settings.GRID_NUM_GRIDS, num_cols=settings.GRID_NUM_GRIDS):
         self.obstacles = obstacles
-        self.nodes = self.generate_nodes()
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        # Size of the arena, in terms of the grid.
+        self.width = num_cols * settings.GRID_CELL_LENGTH
+        self.height = num_rows * settings.GRID_CELL_LENGTH
+
+        self.obstacle_index = ObstacleIndex(obstacles)
+        self.occupancy = self.generate_occupancy()
+
+        # Nodes are only needed for drawing, so they are only generated when first needed.
+        self.__nodes = None
+        # Only needed for path finding, so it is also only generated when first needed.
+        self.__lattice = None
+
+    @property
+    def nodes(self):
+        if self.__nodes is None:
+            self.__nodes = self.generate_nodes()
+        return self.__nodes
+
+    @property
+    def lattice(self) -> StateLattice:
+        if self.__lattice is None:
+            self.__lattice = StateLattice(self)
+        return self.__lattice
+
+    def add_obstacle(self, obstacle: Obstacle):
+        self.obstacles.append(obstacle)
+        self.obstacle_index.add(obstacle)
+        self.update_around(obstacle)
+
+    def remove_obstacle(self, obstacle: Obstacle):
+        self.obstacles.remove(obstacle)
+        self.obstacle_index.remove(obstacle)
+        self.update_around(obstacle)
+
+    def update_around(self, obstacle: Obstacle):
+        """
+        Update everything generated from the obstacles after the specified obstacle is added or removed.
+
+        Only the cells and the part of the state lattice that are near the obstacle are recomputed.
+        """
+        self.occupancy = self.update_occupancy(obstacle)
+        self.__nodes = None
+        if self.__lattice is not None:
+            self.__lattice.update(obstacle.get_boundary_points())
+
+    def generate_occupancy(self):
+        """
+        Generate the occupancy of every cell in this grid.
+
+        Gives the same result as checking check_valid_position at every cell center, but fills in whole runs of cells
+        at a time, as each obstacle (and the border) blocks a rectangle of cells.
+        """
+        # Start with every cell blocked, then free the cells whose centers are far enough from the border.
+        cells = bytearray(b"\x01") * (self.num_rows * self.num_cols)
+        rows = OccupancyGrid.get_centers_between(settings.GRID_CELL_LENGTH, self.height - settings.GRID_CELL_LENGTH,
+                                                 True, self.num_rows)
+        cols = OccupancyGrid.get_centers_between(settings.GRID_CELL_LENGTH, self.width - settings.GRID_CELL_LENGTH,
+                                                 True, self.num_cols)
+        if cols:
+            for row in rows:
+                cells[row * self.num_cols + cols.start:row * self.num_cols + cols.stop] = bytes(len(cols))
+
+        # Then block the cells whose centers are strictly inside the safety boundary of any obstacle.
+        for obstacle in self.obstacles:
+            rows = OccupancyGrid.get_centers_between(obstacle.pos.y - settings.OBSTACLE_SAFETY_WIDTH,
+                                                     obstacle.pos.y + settings.OBSTACLE_SAFETY_WIDTH,
+                                                     False, self.num_rows)
+            cols = OccupancyGrid.get_centers_between(obstacle.pos.x - settings.OBSTACLE_SAFETY_WIDTH,
+                                                     obstacle.pos.x + settings.OBSTACLE_SAFETY_WIDTH,
+                                                     False, self.num_cols)
+            if not cols:
+                continue
+            for row in rows:
+                cells[row * self.num_cols + cols.start:row * self.num_cols + cols.stop] = b"\x01" * len(cols)
+        return OccupancyGrid(self.num_rows, self.num_cols, cells)
+
+    def update_occupancy(self, obstacle: Obstacle):
+        """
+        Get the occupancy grid after the specified obstacle is added or removed, by only checking the cells within its
+        safety boundary again.
+        """
+        rows = OccupancyGrid.get_centers_between(obstacle.pos.y - settings.OBSTACLE_SAFETY_WIDTH,
+                                                 obstacle.pos.y + settings.OBSTACLE_SAFETY_WIDTH,
+                                                 False, self.num_rows)
+        cols = OccupancyGrid.get_centers_between(obstacle.pos.x - settings.OBSTACLE_SAFETY_WIDTH,
+                                                 obstacle.pos.x + settings.OBSTACLE_SAFETY_WIDTH,
+                                                 False, self.num_cols)
+        changes = dict()
+        for row in rows:
+            for col in cols:
+                x, y = OccupancyGrid.get_cell_center(row, col)
+                changes[row * self.num_cols + col] = not self.check_valid_coordinates(x, y)
+        return self.occupancy.updated(changes)
 
     def generate_nodes(self):
         """
         Generate the nodes for this grid.
+
+        Nodes are stored row-major in a flat list, in the same order as the cells of the occupancy grid.
         """
-        nodes = deque()
-        for i in range(settings.GRID_NUM_GRIDS):
-            row = deque()
-            for j in range(settings.GRID_NUM_GRIDS):
-                x, y = (settings.GRID_CELL_LENGTH // 2 + settings.GRID_CELL_LENGTH * j), \
-                       (settings.GRID_CELL_LENGTH // 2 + settings.GRID_CELL_LENGTH * i)
-                new_node = Node(x, y, not self.check_valid_position(Position(x, y)))
-                row.append(new_node)
-            nodes.appendleft(row)
+        nodes = []
+        for i in range(self.num_rows):
+            for j in range(self.num_cols):
+                x, y = OccupancyGrid.get_cell_center(i, j)
+                nodes.append(Node(x, y, self.occupancy.is_occupied(i, j)))
         return nodes
 
     def get_coordinate_node(self, x, y):
         """
-        Get the corresponding Node object that contains specified x, y coordinates.
+        Get the corresponding Node object that contains specified x, y coordinates, or None if they are outside the
+        grid.
 
         Note that the x-y coordinates are in terms of the grid, and must be scaled properly.
         """
-        col_num = math.floor(x / settings.GRID_CELL_LENGTH)
-        row_num = settings.GRID_NUM_GRIDS - math.floor(y / settings.GRID_CELL_LENGTH) - 1
-        try:
-            return self.nodes[row_num][col_num]
-        except IndexError:
+        cell = self.occupancy.get_cell(x, y)
+        if cell is None:
             return None
+        row, col = cell
+        return self.nodes[row * self.num_cols + col]
 
-    def copy(self):
+    def check_valid_position(self, pos: Position):
         """
-        Return a copy of the grid.
+        Check if a current position can be here.
         """
-        nodes = []
-        for row in self.nodes:
-            new_row = []
-            for col in row:
-                new_row.append(col.copy())
-            nodes.append(new_row)
-        new_grid = Grid(self.obstacles)
-        new_grid.nodes = nodes
-        return new_grid
+        return self.check_valid_coordinates(*pos.xy())
 
-    def check_valid_position(self, pos: Position):
+    def check_valid_coordinates(self, x, y):
         """
-        Check if a current position can be here.
+        Check if the robot can be at the specified x, y coordinates.
+
+        Same as check_valid_position, but without needing a Position object.
         """
-        # Check if position is inside any obstacle.
-        if any(obstacle.check_within_boundary(*pos.xy()) for obstacle in self.obstacles):
+        # Check if position is inside any obstacle. Only the obstacles near the position need to be checked.
+        if any(obstacle.check_within_boundary(x, y) for obstacle in self.obstacle_index.get_obstacles_near(x, y)):
             return False
 
         # Check if position too close to the border.
         # NOTE: We allow the robot to overextend the border a little!
         # We do this by setting the limit to be GRID_CELL_LENGTH rather than ROBOT_SAFETY_DISTANCE
-        if (pos.y < settings.GRID_CELL_LENGTH or
-            pos.y > settings.GRID_LENGTH - settings.GRID_CELL_LENGTH) or \
-                (pos.x < settings.GRID_CELL_LENGTH or
-                 pos.x > settings.GRID_LENGTH - settings.GRID_CELL_LENGTH):
+        if (y < settings.GRID_CELL_LENGTH or
+            y > self.height - settings.GRID_CELL_LENGTH) or \
+                (x < settings.GRID_CELL_LENGTH or
+                 x > self.width - settings.GRID_CELL_LENGTH):
             return False
         return True
 
@@ -81,6 +167,8 @@ class Grid:
         """
         Draw the arena borders.
         """
+        pygame = get_pygame()
+
         # Draw upper border
         pygame.draw.line(screen, colors.RED, (0, 0), (settings.GRID_LENGTH, 0))
         # Draw lower border
@@ -95,9 +183,8 @@ class Grid:
             ob.draw(screen)
 
     def draw_nodes(self, screen):
-        for row in self.nodes:
-            for col in row:
-                col.draw(screen)
+        for node in self.nodes:
+            node.draw(screen)
 
     def draw(self, screen):
         # Draw nodes
@@ -1,7 +1,6 @@
-import pygame
-
 from algorithm import settings
 from algorithm.entities.assets import colors
+from algorithm.entities.assets.images import get_pygame
 from algorithm.entities.grid.position import Position
 
 
@@ -31,12 +30,16 @@ class Node:
         return Node(self.pos.x, self.pos.y, self.occupied, self.pos.direction)
 
     def draw_self(self, screen):
+        pygame = get_pygame()
+
         if self.occupied:  # If current node is not permissible to the robot
             rect = pygame.Rect(0, 0, settings.GRID_CELL_LENGTH, settings.GRID_CELL_LENGTH)
             rect.center = self.pos.xy_pygame()
             pygame.draw.rect(screen, colors.ORANGE, rect)
 
     def draw_boundary(self, screen):
+        pygame = get_pygame()
+
         x_pygame, y_pygame = self.pos.xy_pygame()
 
         left = x_pygame - settings.GRID_CELL_LENGTH // 2
@@ -1,8 +1,7 @@
-import pygame
-
 from algorithm import settings
 from algorithm.entities.assets import colors
 from algorithm.entities.assets.direction import Direction
+from algorithm.entities.assets.images import get_pygame, load_image
 from algorithm.entities.grid.position import Position, RobotPosition
 
 
@@ -23,10 +22,6 @@ class Obstacle:
         # Translate given coordinates to be in PyGame coordinates.
         self.pos = Position(x * settings.SCALING_FACTOR, y * settings.SCALING_FACTOR, direction)
 
-        # Arrow to draw at the target coordinate.
-        self.target_image = pygame.transform.scale(pygame.image.load("entities/assets/target-arrow.png"),
-                                                   (50, 50))
-
         self.index = index
 
     def __str__(self):
@@ -34,6 +29,13 @@ class Obstacle:
 
     __repr__ = __str__
 
+    def get_data(self):
+        """
+        Get the parameters needed to create this obstacle again, in the same order as the constructor takes them.
+        """
+        return (int(self.pos.x // settings.SCALING_FACTOR), int(self.pos.y // settings.SCALING_FACTOR),
+                self.pos.direction, self.index)
+
     def check_within_boundary(self, x, y):
         """
         Checks whether a given x-y coordinate is within the safety boundary of this obstacle.
@@ -82,7 +84,31 @@ class Obstacle:
         else:
             return RobotPosition(self.pos.x + settings.OBSTACLE_SAFETY_WIDTH + settings.OBSTACLE_LENGTH, self.pos.y, Direction.LEFT)
 
+    def get_robot_target_poses(self):
+        """
+        Returns every pose that the robot can scan this obstacle's image from, in order of preference. The first one
+        is always get_robot_target_pos().
+
+        The rest are further away from the obstacle, or shifted to the side, while still facing the same way. They
+        are used when the usual target is hard or impossible to get to.
+        """
+        target = self.get_robot_target_pos()
+        # Direction from the obstacle towards the target, and the direction to its side.
+        away_x = (target.x > self.pos.x) - (target.x < self.pos.x)
+        away_y = (target.y > self.pos.y) - (target.y < self.pos.y)
+        side_x, side_y = -away_y, away_x
+
+        poses = []
+        for extra in settings.OBSTACLE_TARGET_EXTRA_DISTANCES:
+            for offset in settings.OBSTACLE_TARGET_SIDE_OFFSETS:
+                poses.append(RobotPosition(target.x + away_x * extra + side_x * offset,
+                                           target.y + away_y * extra + side_y * offset,
+                                           target.direction))
+        return poses
+
     def draw_self(self, screen):
+        pygame = get_pygame()
+
         # Draw the obstacle onto the grid.
         # We need to translate the obstacle's center into that with respect to PyGame
         # Get the coordinates of the grid's bottom left-hand corner.
@@ -108,6 +134,8 @@ class Obstacle:
         pygame.draw.rect(screen, colors.RED, rect)
 
     def draw_virtual_boundary(self, screen):
+        pygame = get_pygame()
+
         # Get the boundary points
         points = self.get_boundary_points()
 
@@ -121,9 +149,12 @@ class Obstacle:
         pygame.draw.line(screen, colors.BLUE, points[0].xy_pygame(), points[1].xy_pygame())
 
     def draw_robot_target(self, screen):
+        pygame = get_pygame()
+
         target = self.get_robot_target_pos()
 
-        rot_image = self.target_image
+        # Arrow to draw at the target coordinate.
+        rot_image = load_image("target-arrow.png", (50, 50))
         angle = 0
         if target.direction == Direction.BOTTOM:
             angle = 180
@@ -0,0 +1,50 @@
+import math
+from collections import defaultdict
+from typing import List
+
+from algorithm import settings
+from algorithm.entities.grid.obstacle import Obstacle
+
+
+class ObstacleIndex:
+    """
+    Spatial hash of the obstacles' safety boundaries.
+
+    The arena is split into square buckets, and each obstacle is stored in every bucket that its safety boundary
+    touches. Finding the obstacles that could contain a point then only needs to look in a single bucket, no matter
+    how many obstacles there are.
+    """
+    def __init__(self, obstacles: List[Obstacle], bucket_length=settings.GRID_CELL_LENGTH):
+        self.bucket_length = bucket_length
+        self.buckets = defaultdict(list)
+        for obstacle in obstacles:
+            self.add(obstacle)
+
+    def get_bucket(self, x, y):
+        return math.floor(x / self.bucket_length), math.floor(y / self.bucket_length)
+
+    def get_buckets_in(self, x_min, y_min, x_max, y_max):
+        """
+        Get every bucket that touches the specified axis-aligned box.
+        """
+        col_min, row_min = self.get_bucket(x_min, y_min)
+        col_max, row_max = self.get_bucket(x_max, y_max)
+        return [(col, row) for col in range(col_min, col_max + 1) for row in range(row_min, row_max + 1)]
+
+    def get_obstacle_buckets(self, obstacle: Obstacle):
+        points = obstacle.get_boundary_points()
+        return self.get_buckets_in(points[0].x, points[0].y, points[3].x, points[3].y)
+
+    def add(self, obstacle: Obstacle):
+        for bucket in self.get_obstacle_buckets(obstacle):
+            self.buckets[bucket].append(obstacle)
+
+    def remove(self, obstacle: Obstacle):
+        for bucket in self.get_obstacle_buckets(obstacle):
+            self.buckets[bucket].remove(obstacle)
+
+    def get_obstacles_near(self, x, y) -> List[Obstacle]:
+        """
+        Get the obstacles whose safety boundary could contain the specified x, y coordinates.
+        """
+        return self.buckets.get(self.get_bucket(x, y), [])
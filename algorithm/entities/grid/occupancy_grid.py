@@ -0,0 +1,83 @@
+import math
+
+from algorithm import settings
+
+
+class OccupancyGrid:
+    """
+    Immutable record of which grid cells the robot cannot be in.
+
+    This is built once for each obstacle layout, and then shared by every search on that layout without copying.
+    Cells are stored row-major in a flat bytes object. Row 0 is at the bottom of the arena, so that the row number
+    increases together with the y-coordinate.
+    """
+    __slots__ = ("num_rows", "num_cols", "_cells")
+
+    def __init__(self, num_rows, num_cols, cells: bytes):
+        assert len(cells) == num_rows * num_cols, "Number of cells does not match the grid size!"
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self._cells = bytes(cells)
+
+    def __str__(self):
+        return f"OccupancyGrid({self.num_rows}x{self.num_cols}, {sum(self._cells)} occupied)"
+
+    __repr__ = __str__
+
+    def get_cell(self, x, y):
+        """
+        Get the (row, column) of the cell that contains the specified x, y coordinates, or None if the coordinates
+        are outside the grid.
+
+        Note that the x-y coordinates are in terms of the grid, and must be scaled properly.
+        """
+        row = math.floor(y / settings.GRID_CELL_LENGTH)
+        col = math.floor(x / settings.GRID_CELL_LENGTH)
+        if 0 <= row < self.num_rows and 0 <= col < self.num_cols:
+            return row, col
+        return None
+
+    @classmethod
+    def get_centers_between(cls, low, high, inclusive, count):
+        """
+        Get the range of cell indices (rows or columns) whose centers are between low and high, out of count cells.
+
+        If inclusive, centers exactly at low or high are also in the range.
+        """
+        half = settings.GRID_CELL_LENGTH // 2
+        if inclusive:
+            first = math.ceil((low - half) / settings.GRID_CELL_LENGTH)
+            last = math.floor((high - half) / settings.GRID_CELL_LENGTH)
+        else:
+            first = math.floor((low - half) / settings.GRID_CELL_LENGTH) + 1
+            last = math.ceil((high - half) / settings.GRID_CELL_LENGTH) - 1
+        return range(max(0, first), min(count, last + 1))
+
+    @classmethod
+    def get_cell_center(cls, row, col):
+        """
+        Get the x, y coordinates of the center of the specified cell.
+        """
+        return (settings.GRID_CELL_LENGTH // 2 + settings.GRID_CELL_LENGTH * col,
+                settings.GRID_CELL_LENGTH // 2 + settings.GRID_CELL_LENGTH * row)
+
+    def updated(self, changes):
+        """
+        Get a copy of this occupancy grid with some cells changed. This grid itself is not changed, as searches may
+        still be using it.
+
+        changes -> Whether each changed cell is occupied, keyed by the cell's row * number of columns + column.
+        """
+        cells = bytearray(self._cells)
+        for cell, occupied in changes.items():
+            cells[cell] = occupied
+        return OccupancyGrid(self.num_rows, self.num_cols, cells)
+
+    def is_occupied(self, row, col):
+        return self._cells[row * self.num_cols + col] != 0
+
+    def count_free_cells(self, row, col_start, col_stop):
+        """
+        Count the free cells in the specified row, from col_start up to (but not including) col_stop.
+        """
+        return self._cells[row * self.num_cols + col_start:row * self.num_cols + col_stop].count(0)
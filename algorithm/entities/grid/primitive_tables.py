@@ -0,0 +1,184 @@
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+
+from algorithm import settings
+from algorithm.entities.files import write_atomically
+from algorithm.entities.grid.arc import EPSILON
+from algorithm.entities.grid.occupancy_grid import OccupancyGrid
+
+# Bump this whenever the file layout, or the way that the tables are built, changes.
+TABLES_VERSION = 1
+MAGIC = b"PRIM"
+# Magic, version, hash of what the tables were built from, number of rows, number of columns, number of headings,
+# and number of primitives.
+HEADER = struct.Struct("<4sH32sHHBB")
+# Each move's swept cells are stored as a count, followed by that many (d_row, d_col) pairs.
+SWEPT_COUNT = struct.Struct("<H")
+SWEPT_CELL = struct.Struct("<hh")
+
+
+class PrimitiveTables:
+    """
+    Parts of the state lattice that depend only on the settings and the size of the grid, and not on the obstacles.
+
+    For every move, the swept cells are the cells (relative to the starting cell) that an obstacle could be centered in
+    to block the move. For every state, the border mask has one bit for each primitive, set if its move stays on
+    the grid and far enough from the arena borders.
+
+    The tables are built once, and then saved to a binary file that later processes memory-map instead of building
+    them again. The file records a hash of everything that the tables were built from, so a file built with other
+    settings is never used.
+    """
+    # Tables that this process already has, keyed by (number of rows, number of columns).
+    loaded = dict()
+
+    def __init__(self, key, num_rows, num_cols, swept_cells, border_masks):
+        self.key = key
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.swept_cells = swept_cells  # For each heading, for each primitive, list of (d_row, d_col).
+        self.border_masks = border_masks  # Indexed by state.
+
+    @classmethod
+    def get(cls, moves, num_rows, num_cols):
+        """
+        Get the tables for the specified moves (for each heading, for each primitive) on a grid of the specified size.
+
+        They are loaded from the file if it was built from the same moves and settings, and built otherwise.
+        """
+        key = cls.get_key(moves)
+        tables = cls.loaded.get((num_rows, num_cols))
+        if tables is not None and tables.key == key:
+            return tables
+
+        path = cls.get_path(num_rows, num_cols)
+        tables = cls.load(path, key, num_rows, num_cols) if path is not None else None
+        if tables is None:
+            tables = cls.build(key, moves, num_rows, num_cols)
+            if path is not None:
+                tables.save(path)
+        cls.loaded[(num_rows, num_cols)] = tables
+        return tables
+
+    @classmethod
+    def get_key(cls, moves) -> bytes:
+        """
+        Get a hash of everything that the tables are built from.
+        """
+        described = [[(move.d_row, move.d_col, move.heading, None if move.arc is None else
+                       (move.arc.center_x, move.arc.center_y, move.arc.radius, move.arc.start, move.arc.sweep))
+                      for move in heading_moves] for heading_moves in moves]
+        text = json.dumps([TABLES_VERSION, settings.GRID_CELL_LENGTH, settings.OBSTACLE_SAFETY_WIDTH, described])
+        return hashlib.sha256(text.encode()).digest()
+
+    @classmethod
+    def get_path(cls, num_rows, num_cols):
+        if settings.PATH_PRIMITIVE_TABLES_DIR is None:
+            return None
+        return os.path.join(settings.PATH_PRIMITIVE_TABLES_DIR, f"primitive_tables_{num_rows}x{num_cols}.bin")
+
+    @classmethod
+    def build(cls, key, moves, num_rows, num_cols):
+        swept_cells = [[cls.compute_swept_cells(move) for move in heading_moves] for heading_moves in moves]
+
+        # Same border limits as Grid.check_valid_coordinates, with some leeway for floating point errors.
+        low, high_x, high_y = (settings.GRID_CELL_LENGTH - EPSILON,
+                               num_cols * settings.GRID_CELL_LENGTH - settings.GRID_CELL_LENGTH + EPSILON,
+                               num_rows * settings.GRID_CELL_LENGTH - settings.GRID_CELL_LENGTH + EPSILON)
+        border_masks = bytearray(num_rows * num_cols * len(moves))
+        for row in range(num_rows):
+            for col in range(num_cols):
+                x, y = OccupancyGrid.get_cell_center(row, col)
+                for heading, heading_moves in enumerate(moves):
+                    mask = 0
+                    for index, move in enumerate(heading_moves):
+                        if not (0 <= row + move.d_row < num_rows and 0 <= col + move.d_col < num_cols):
+                            continue
+                        if move.arc is not None:
+                            x_min, y_min, x_max, y_max = move.arc.get_bounds()
+                            if min(x + x_min, y + y_min) < low or x + x_max > high_x or y + y_max > high_y:
+                                continue
+                        mask |= 1 << index
+                    border_masks[(row * num_cols + col) * len(moves) + heading] = mask
+        return cls(key, num_rows, num_cols, swept_cells, bytes(border_masks))
+
+    @classmethod
+    def compute_swept_cells(cls, move):
+        """
+        Get every cell, relative to the starting cell, that an obstacle can be centered in to block the move.
+
+        Only turns are checked, as a straight move only needs its ending cell to be free. Obstacles are always
+        centered in a cell, so whether one blocks a move only depends on where it is relative to the starting cell.
+        """
+        if move.arc is None:
+            return []
+        x_min, y_min, x_max, y_max = move.arc.get_bounds()
+        width, length = settings.OBSTACLE_SAFETY_WIDTH, settings.GRID_CELL_LENGTH
+        cells = []
+        for d_row in range(math.floor((y_min - width) / length), math.ceil((y_max + width) / length) + 1):
+            for d_col in range(math.floor((x_min - width) / length), math.ceil((x_max + width) / length) + 1):
+                x, y = d_col * length, d_row * length
+                if move.arc.check_within_box(x - width, y - width, x + width, y + width):
+                    cells.append((d_row, d_col))
+        return cells
+
+    def save(self, path):
+        num_headings, num_primitives = len(self.swept_cells), len(self.swept_cells[0])
+        parts = [HEADER.pack(MAGIC, TABLES_VERSION, self.key, self.num_rows, self.num_cols,
+                             num_headings, num_primitives)]
+        for heading_cells in self.swept_cells:
+            for cells in heading_cells:
+                parts.append(SWEPT_COUNT.pack(len(cells)))
+                parts.extend(SWEPT_CELL.pack(d_row, d_col) for d_row, d_col in cells)
+        parts.append(self.border_masks)
+
+        try:
+            write_atomically(path, b"".join(parts))
+        except OSError as e:
+            print(f"Could not save primitive tables to {path}: {e}")
+
+    @classmethod
+    def load(cls, path, key, num_rows, num_cols):
+        """
+        Memory-map the tables from the file, or get None if there is no file or it was not built for the same key and
+        grid size.
+        """
+        try:
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        try:
+            magic, version, saved_key, saved_rows, saved_cols, num_headings, num_primitives = \
+                HEADER.unpack_from(mapped, 0)
+            if (magic, version, saved_key, saved_rows, saved_cols) != (MAGIC, TABLES_VERSION, key, num_rows, num_cols):
+                mapped.close()
+                return None
+
+            offset = HEADER.size
+            swept_cells = []
+            for _ in range(num_headings):
+                heading_cells = []
+                for _ in range(num_primitives):
+                    count, = SWEPT_COUNT.unpack_from(mapped, offset)
+                    offset += SWEPT_COUNT.size
+                    heading_cells.append([SWEPT_CELL.unpack_from(mapped, offset + i * SWEPT_CELL.size)
+                                          for i in range(count)])
+                    offset += count * SWEPT_CELL.size
+                swept_cells.append(heading_cells)
+        except struct.error:
+            mapped.close()
+            return None
+
+        num_states = num_rows * num_cols * num_headings
+        if len(mapped) != offset + num_states:
+            mapped.close()
+            return None
+        # The border masks are read straight from the mapped file, without copying them.
+        border_masks = memoryview(mapped)[offset:]
+        return cls(key, num_rows, num_cols, swept_cells, border_masks)
@@ -0,0 +1,516 @@
+import heapq
+import math
+from array import array
+from collections import Counter, OrderedDict
+from typing import List
+
+from algorithm import settings
+from algorithm.entities.assets.direction import Direction
+from algorithm.entities.commands.straight_command import StraightCommand
+from algorithm.entities.commands.turn_command import TurnCommand
+from algorithm.entities.grid.arc import Arc
+from algorithm.entities.grid.occupancy_grid import OccupancyGrid
+from algorithm.entities.grid.position import Position, RobotPosition
+from algorithm.entities.grid.primitive_tables import PrimitiveTables
+
+# Headings in counter-clockwise order, so that a 90-degree turn to the left adds 1 to the heading index.
+HEADINGS = (Direction.RIGHT, Direction.TOP, Direction.LEFT, Direction.BOTTOM)
+
+# Index of the forwards and backwards straight movements in PRIMITIVES.
+STRAIGHT_PRIMITIVES = (0, 1)
+
+# Every possible movement, in the order that they are tried. Searches refer to them by their index in here, and paths
+# share these same command objects. Commands cannot be changed, and compare equal by value, so any copy of one of
+# these is found here again.
+# We assume the robot will always make a full 90-degree turn to the next neighbour, and that it will travel
+# a fix distance of 10 when travelling straight.
+PRIMITIVES = (
+    StraightCommand(10 * settings.SCALING_FACTOR),
+    StraightCommand(-10 * settings.SCALING_FACTOR),
+    TurnCommand(90, False),  # Forward right turn
+    TurnCommand(-90, False),  # Forward left turn
+    TurnCommand(90, True),  # Reverse with wheels to right.
+    TurnCommand(-90, True),  # Reverse with wheels to left.
+)
+# Index in PRIMITIVES of each command, found by value.
+PRIMITIVE_INDICES = {command: index for index, command in enumerate(PRIMITIVES)}
+
+
+class Move:
+    """
+    Result of making one movement from any cell center while facing a specific heading.
+
+    All offsets are relative to the starting cell, so the same Move can be used from every cell.
+    """
+    __slots__ = ("d_row", "d_col", "heading", "weight", "arc")
+
+    def __init__(self, d_row, d_col, heading, weight, arc: Arc = None):
+        self.d_row = d_row
+        self.d_col = d_col
+        self.heading = heading  # Heading index after the move.
+        self.weight = weight  # Cost of making this move.
+        self.arc = arc  # Path taken by the robot when turning, starting from the origin. None for straight moves.
+
+
+class StateTable(dict):
+    """
+    Values for some of the states, where every other state has the same default value.
+    """
+    def __init__(self, default):
+        super().__init__()
+        self.default = default
+
+    def __missing__(self, state):
+        return self.default
+
+
+class StateLattice:
+    """
+    Table of every valid movement from every search state on a grid.
+
+    A search state is a single int that encodes a cell and a heading. For every state, the table stores the list of
+    (new state, cost, primitive index) that the robot can reach with a single movement. The table only depends on the
+    obstacle layout, so it is built once for each layout and then shared by every search on it.
+
+    A lattice can also be limited to some of the cells of the grid, in which case the robot can only move between
+    those cells. Its tables then only store the states in those cells, and only the obstacles near them are checked,
+    so building and searching it takes time in proportion to the number of cells rather than to the size of the grid.
+    """
+    def __init__(self, grid, cells=None):
+        """
+        cells -> Set of the cells (as row * number of columns + column) that the robot can use. None for every cell.
+        """
+        self.grid = grid
+        self.num_rows = grid.occupancy.num_rows
+        self.num_cols = grid.occupancy.num_cols
+        self.cells = cells
+
+        # For each heading, the possible moves from it.
+        self.moves = [[self.compute_move(command, heading) for command in PRIMITIVES]
+                      for heading in range(len(HEADINGS))]
+        # How many cells away from its starting cell a move can check.
+        self.reach = max(self.compute_reach(move) for moves in self.moves for move in moves)
+        # Cheapest costs of a single straight move and a single turn, used by estimate_cost.
+        self.straight_weight = min(self.moves[0][primitive].weight for primitive in STRAIGHT_PRIMITIVES)
+        self.turn_weight = min(move.weight for move in self.moves[0] if move.arc is not None)
+        # Swept cells and border masks, which are the same for every obstacle layout.
+        self.tables = PrimitiveTables.get(self.moves, self.num_rows, self.num_cols)
+        # For every state, a bitmask of the primitives whose moves are blocked by an obstacle.
+        self.blocked = self.compute_blocked()
+
+        self.successors = self.new_state_table(())
+        for state in self.get_states():
+            self.successors[state] = self.compute_successors(state)
+        # Reverse of the successors table. Only generated when first needed, and thrown away whenever it changes.
+        self.__predecessors = None
+        # Same as above, for the free-run table and the connected components.
+        self.__runs = None
+        self.__components = None
+        # Cost-to-go tables for the most recently used goal states, with the most recently used last.
+        self.cost_to_go_cache = OrderedDict()
+        # Number of times that each goal state without a cached table was searched for. See find_cost_to_go.
+        self.cost_to_go_queries = Counter()
+
+    def new_state_table(self, default, typecode=None):
+        """
+        Get a table indexed by state, with every state starting at the default value. Unless the lattice is limited to
+        some cells, this is an array of the typecode (or a list if None) covering every state of the grid.
+        """
+        if self.cells is not None:
+            return StateTable(default)
+        if typecode is None:
+            return [default] * self.num_states
+        return array(typecode, [default]) * self.num_states
+
+    @property
+    def num_states(self):
+        return self.num_rows * self.num_cols * len(HEADINGS)
+
+    @property
+    def predecessors(self):
+        """
+        For every state, the list of (previous state, cost, primitive index) that reach it with a single movement.
+        """
+        if self.__predecessors is None:
+            self.__predecessors = self.new_state_table(())
+            for state in self.get_states():
+                self.__predecessors[state] = []
+            for state in self.get_states():
+                for new_state, weight, move in self.successors[state]:
+                    self.__predecessors[new_state].append((state, weight, move))
+        return self.__predecessors
+
+    @property
+    def runs(self):
+        """
+        For each straight primitive, how many of that move the robot can make in a row from every state.
+        """
+        if self.__runs is None:
+            self.__runs = [self.compute_runs(primitive) for primitive in STRAIGHT_PRIMITIVES]
+        return self.__runs
+
+    def compute_runs(self, primitive):
+        """
+        Get how many times in a row the robot can make the specified straight move from every state.
+        """
+        runs = self.new_state_table(0, "l")
+        for state in self.get_states():
+            runs[state] = -1  # Not worked out yet.
+        for state in self.get_states():
+            # Follow the moves from this state until reaching a state that cannot move on, or whose run is known.
+            chain = []
+            while state is not None and runs[state] == -1:
+                chain.append(state)
+                state = self.get_straight_successor(state, primitive)
+            run = -1 if state is None else runs[state]
+            # Every state in the chain can make one more move than the state after it.
+            for state in reversed(chain):
+                run += 1
+                runs[state] = run
+        return runs
+
+    def get_end_state(self, state, commands):
+        """
+        Get the state reached by making the moves of the given commands from a state, or None if any of the moves is
+        not valid any more, or is not one of PRIMITIVES.
+        """
+        for command in commands:
+            primitive = PRIMITIVE_INDICES.get(command)
+            for new_state, _, move in self.successors[state]:
+                if move == primitive:
+                    state = new_state
+                    break
+            else:
+                return None
+        return state
+
+    def get_straight_successor(self, state, primitive):
+        """
+        Get the state reached by making the specified straight move from a state, or None if the move is not valid.
+        """
+        for new_state, _, move in self.successors[state]:
+            if move == primitive:
+                return new_state
+        return None
+
+    def get_straight_step(self, heading, primitive):
+        """
+        Get how much a search state changes by for every straight move of the specified primitive from the heading.
+        """
+        move = self.moves[heading][primitive]
+        return (move.d_row * self.num_cols + move.d_col) * len(HEADINGS)
+
+    @property
+    def components(self):
+        """
+        Label of the connected component of every state. The robot can get from one state to another only if they
+        have the same label.
+        """
+        if self.__components is None:
+            self.__components = self.compute_components()
+        return self.__components
+
+    def compute_components(self):
+        """
+        Label the connected components of the lattice, by flood filling from every state that is not labelled yet.
+
+        Every move can be undone by the opposite move back along the same path, so the robot can get between any
+        two states in the same component. The fill follows moves both ways regardless, so that a state the robot
+        can reach is never put in a different component.
+        """
+        components = self.new_state_table(-1, "l")  # -1 means not labelled yet.
+        predecessors = self.predecessors
+        label = 0
+        for state in self.get_states():
+            if components[state] != -1:
+                continue
+            components[state] = label
+            stack = [state]
+            while stack:
+                current_state = stack.pop()
+                for new_state, _, _ in self.successors[current_state]:
+                    if components[new_state] == -1:
+                        components[new_state] = label
+                        stack.append(new_state)
+                for new_state, _, _ in predecessors[current_state]:
+                    if components[new_state] == -1:
+                        components[new_state] = label
+                        stack.append(new_state)
+            label += 1
+        return components
+
+    def is_reachable(self, start_state, goal_state):
+        """
+        Check if the robot could get from the start state to the goal state. Either state can be None (off the grid),
+        or outside the cells of the lattice, in which case it cannot.
+        """
+        if start_state is None or goal_state is None:
+            return False
+        return self.components[start_state] == self.components[goal_state] != -1
+
+    def get_states(self):
+        """
+        Get every state in the cells of this lattice.
+        """
+        cells = range(self.num_rows * self.num_cols) if self.cells is None else sorted(self.cells)
+        return [cell * len(HEADINGS) + heading for cell in cells for heading in range(len(HEADINGS))]
+
+    @classmethod
+    def compute_move(cls, command, heading):
+        """
+        Simulate a command from the origin while facing the specified heading, to see where it brings the robot.
+        """
+        p = RobotPosition(0, 0, HEADINGS[heading])
+        command.apply_on_pos(p)
+        d_row, d_col = round(p.y / settings.GRID_CELL_LENGTH), round(p.x / settings.GRID_CELL_LENGTH)
+        if not isinstance(command, TurnCommand):
+            return Move(d_row, d_col, HEADINGS.index(p.direction), abs(command.dist))
+
+        arc = Arc.from_turn(0, 0, HEADINGS[heading].value,
+                            d_col * settings.GRID_CELL_LENGTH, d_row * settings.GRID_CELL_LENGTH,
+                            settings.ROBOT_TURN_RADIUS)
+        return Move(d_row, d_col, HEADINGS.index(p.direction), settings.PATH_TURN_COST, arc)
+
+    @classmethod
+    def compute_reach(cls, move: Move):
+        """
+        Get how many cells away from its starting cell a move can check.
+        """
+        reach = max(abs(move.d_row), abs(move.d_col))
+        if move.arc is not None:
+            reach = max(reach, *(abs(bound) / settings.GRID_CELL_LENGTH for bound in move.arc.get_bounds()))
+        return reach + 1
+
+    def compute_blocked(self):
+        """
+        Get a bitmask for every state, with a bit set for each primitive whose move is blocked by an obstacle.
+
+        Rather than checking every move against the obstacles, this marks the moves whose swept cells each obstacle
+        is centered in. If the lattice is limited to some cells, obstacles too far from all of them are skipped.
+        """
+        blocked = self.new_state_table(0, "B")
+        if self.cells is not None:
+            rows = [cell // self.num_cols for cell in self.cells]
+            cols = [cell % self.num_cols for cell in self.cells]
+            if not rows:
+                return blocked
+            row_min, row_max = min(rows) - self.reach, max(rows) + self.reach
+            col_min, col_max = min(cols) - self.reach, max(cols) + self.reach
+        for obstacle in self.grid.obstacles:
+            obstacle_row = math.floor(obstacle.pos.y / settings.GRID_CELL_LENGTH)
+            obstacle_col = math.floor(obstacle.pos.x / settings.GRID_CELL_LENGTH)
+            if self.cells is not None and not (row_min <= obstacle_row <= row_max and
+                                               col_min <= obstacle_col <= col_max):
+                continue
+            for heading, heading_cells in enumerate(self.tables.swept_cells):
+                for index, cells in enumerate(heading_cells):
+                    for d_row, d_col in cells:
+                        row, col = obstacle_row - d_row, obstacle_col - d_col
+                        if 0 <= row < self.num_rows and 0 <= col < self.num_cols and \
+                                (self.cells is None or row * self.num_cols + col in self.cells):
+                            blocked[(row * self.num_cols + col) * len(HEADINGS) + heading] |= 1 << index
+        return blocked
+
+    def compute_successors(self, state):
+        """
+        Get every (new state, cost, primitive index) reachable from this state without the robot going into any invalid
+        position.
+        """
+        cell, heading = divmod(state, len(HEADINGS))
+        row, col = divmod(cell, self.num_cols)
+        occupancy = self.grid.occupancy
+        if occupancy.is_occupied(row, col) or (self.cells is not None and cell not in self.cells):
+            return ()
+        # Moves that stay clear of both the borders and the obstacles.
+        allowed = self.tables.border_masks[state] & ~self.blocked[state]
+
+        successors = []
+        for index, move in enumerate(self.moves[heading]):
+            if not allowed >> index & 1:
+                continue
+            new_row, new_col = row + move.d_row, col + move.d_col
+            if occupancy.is_occupied(new_row, new_col):
+                continue
+            if self.cells is not None and new_row * self.num_cols + new_col not in self.cells:
+                continue
+            new_state = (new_row * self.num_cols + new_col) * len(HEADINGS) + move.heading
+            successors.append((new_state, move.weight, index))
+        return tuple(successors)
+
+    def find_cost_to_go(self, goal_state):
+        """
+        Get the cost-to-go table for a goal state that is about to be searched for, if it is worth having.
+
+        That is if the table is already cached, or if the goal has now been searched for
+        PATH_HEURISTIC_TABLE_MIN_QUERIES times. Otherwise, this gets None, and the search should use estimate_cost
+        instead, as building a table searches the whole lattice, which takes far longer than most single searches.
+        """
+        if goal_state not in self.cost_to_go_cache:
+            self.cost_to_go_queries[goal_state] += 1
+            if self.cost_to_go_queries[goal_state] < settings.PATH_HEURISTIC_TABLE_MIN_QUERIES:
+                return None
+            del self.cost_to_go_queries[goal_state]
+        return self.get_cost_to_go(goal_state)
+
+    def get_cost_to_go(self, goal_state):
+        """
+        Get the cost of the cheapest path from every state to the goal state, as an array indexed by state. States
+        that cannot reach the goal have an infinite cost.
+
+        This searches backwards from the goal over the predecessors (Dijkstra's algorithm), so it accounts for obstacles
+        and turns, and is exact. Tables are cached for the most recently used goals until the lattice is next updated.
+        """
+        if goal_state in self.cost_to_go_cache:
+            self.cost_to_go_cache.move_to_end(goal_state)
+            return self.cost_to_go_cache[goal_state]
+
+        cost = self.new_state_table(math.inf, "d")
+        cost[goal_state] = 0
+        frontier = [(0, goal_state)]
+        predecessors = self.predecessors
+        while frontier:
+            current_cost, state = heapq.heappop(frontier)
+            if current_cost > cost[state]:
+                # Outdated entry, as a cheaper way from this state was found after it was added.
+                continue
+            for prev_state, weight, _ in predecessors[state]:
+                new_cost = current_cost + weight
+                if new_cost < cost[prev_state]:
+                    cost[prev_state] = new_cost
+                    heapq.heappush(frontier, (new_cost, prev_state))
+
+        self.cost_to_go_cache[goal_state] = cost
+        if len(self.cost_to_go_cache) > settings.PATH_HEURISTIC_CACHE_SIZE:
+            self.cost_to_go_cache.popitem(last=False)
+        return cost
+
+    def estimate_moves(self, state, goal_state):
+        """
+        Get lower bounds of the number of turns, and of the number of straight moves, needed to get from a state to the
+        goal state, without searching.
+
+        A turn moves the robot two cells along both the rows and the columns, and turns it by 90 degrees. So the robot
+        needs at least one turn to face a perpendicular heading, and at least two to face the opposite heading, or to
+        face the same heading on another line. Every cell that the turns cannot cover needs a straight move.
+        """
+        heading, goal_heading = state % len(HEADINGS), goal_state % len(HEADINGS)
+        row, col = divmod(state // len(HEADINGS), self.num_cols)
+        goal_row, goal_col = divmod(goal_state // len(HEADINGS), self.num_cols)
+        d_row, d_col = abs(goal_row - row), abs(goal_col - col)
+
+        if heading == goal_heading:
+            # Facing right or left only moves along the row, and facing up or down only along the column.
+            turns = 0 if (d_row if heading % 2 == 0 else d_col) == 0 else 2
+        else:
+            turns = 1 if (goal_heading - heading) % 2 else 2
+        return turns, max(0, d_row + d_col - 4 * turns)
+
+    def estimate_cost(self, state, goal_state):
+        """
+        Get a lower bound of the cost of getting from a state to the goal state, from estimate_moves. This never
+        overestimates, as long as a turn costs at least as much as the four straight moves that it can cover.
+        """
+        turns, straights = self.estimate_moves(state, goal_state)
+        return turns * self.turn_weight + straights * self.straight_weight
+
+    def update(self, boundary_points: List[Position]):
+        """
+        Recompute the successors of every state whose moves could pass through the area bounded by the given
+        points. Must be called after the grid's occupancy has been updated for an obstacle change in that area.
+        """
+        self.blocked = self.compute_blocked()
+        x_min, x_max = min(p.x for p in boundary_points), max(p.x for p in boundary_points)
+        y_min, y_max = min(p.y for p in boundary_points), max(p.y for p in boundary_points)
+        # Any state whose cell is within reach of the area could have a move that goes through it.
+        row_min = max(0, int(y_min // settings.GRID_CELL_LENGTH - self.reach))
+        row_max = min(self.num_rows - 1, int(y_max // settings.GRID_CELL_LENGTH + self.reach))
+        col_min = max(0, int(x_min // settings.GRID_CELL_LENGTH - self.reach))
+        col_max = min(self.num_cols - 1, int(x_max // settings.GRID_CELL_LENGTH + self.reach))
+
+        changed = []
+        for row in range(row_min, row_max + 1):
+            for col in range(col_min, col_max + 1):
+                for heading in range(len(HEADINGS)):
+                    state = (row * self.num_cols + col) * len(HEADINGS) + heading
+                    successors = self.compute_successors(state)
+                    if successors == self.successors[state]:
+                        continue
+                    if self.__predecessors is not None:
+                        # Patch the reverse table, rather than building it again.
+                        for new_state, weight, move in self.successors[state]:
+                            self.__predecessors[new_state].remove((state, weight, move))
+                        for new_state, weight, move in successors:
+                            self.__predecessors[new_state].append((state, weight, move))
+                    self.successors[state] = successors
+                    changed.append(state)
+        if not changed:
+            return
+
+        # These were found from the old successors, and are cheap enough to build again when next needed.
+        self.__runs = None
+        self.__components = None
+        # Cost-to-go tables are repaired instead, as each of them took a whole search to build.
+        for goal_state, cost in self.cost_to_go_cache.items():
+            self.repair_cost_to_go(cost, goal_state, changed)
+
+    def repair_cost_to_go(self, cost, goal_state, changed_states):
+        """
+        Repair a cost-to-go table in place, after the successors of the given states have changed.
+
+        This works in the same way as D* Lite: a state is inconsistent if its cost does not match the cheapest of its
+        moves, and only inconsistent states are visited, in order of cost. Costs that drop are passed on to the
+        states that lead into them. A cost that rises is first reset to infinite, then worked out again from its
+        moves. So only the states whose cost changes are searched again, rather than the whole lattice.
+        """
+        predecessors = self.predecessors
+        frontier = []
+
+        def get_best_cost(state):
+            # Cheapest cost to go from this state by way of its moves, based on the current costs.
+            if state == goal_state:
+                return 0
+            return min((weight + cost[new_state] for new_state, weight, _ in self.successors[state]), default=math.inf)
+
+        def push_if_inconsistent(state):
+            best = get_best_cost(state)
+            if best != cost[state]:
+                heapq.heappush(frontier, (min(best, cost[state]), state))
+
+        for state in changed_states:
+            push_if_inconsistent(state)
+        while frontier:
+            key, state = heapq.heappop(frontier)
+            best = get_best_cost(state)
+            if best == cost[state] or key != min(best, cost[state]):
+                # Outdated entry, as the state was made consistent, or pushed again, after it was added.
+                continue
+
+            if best < cost[state]:
+                cost[state] = best
+            else:
+                cost[state] = math.inf
+                push_if_inconsistent(state)
+            for prev_state, _, _ in predecessors[state]:
+                push_if_inconsistent(prev_state)
+
+    def get_state(self, pos: Position):
+        """
+        Get the search state for a position, or None if it is off the grid.
+        """
+        cell = self.grid.occupancy.get_cell(*pos.xy())
+        if cell is None:
+            return None
+        row, col = cell
+        return (row * self.num_cols + col) * len(HEADINGS) + HEADINGS.index(pos.direction)
+
+    def get_xy(self, state):
+        """
+        Get the x, y coordinates of the center of the cell for a search state.
+        """
+        return OccupancyGrid.get_cell_center(*divmod(state // len(HEADINGS), self.num_cols))
+
+    def get_position(self, state):
+        """
+        Get the position at the center of the cell for a search state, facing its heading.
+        """
+        return RobotPosition(*self.get_xy(state), HEADINGS[state % len(HEADINGS)])
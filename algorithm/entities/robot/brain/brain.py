@@ -1,48 +1,199 @@
-import itertools
-import math
+import time
 from collections import deque
-from typing import Tuple
+from typing import List, Tuple
 
 from algorithm import settings
 from algorithm.entities.commands.scan_command import ScanCommand
 from algorithm.entities.commands.straight_command import StraightCommand
+from algorithm.entities.commands.turn_command import TurnCommand
 from algorithm.entities.grid.obstacle import Obstacle
+from algorithm.entities.grid.state_lattice import PRIMITIVES, STRAIGHT_PRIMITIVES
+from algorithm.entities.robot.brain.hierarchical_a_star import HierarchicalAStar
 from algorithm.entities.robot.brain.mod_a_star import ModifiedAStar
+from algorithm.entities.robot.brain.planner_pool import PlannerPool
+from algorithm.entities.robot.brain.tour_solver import HeldKarpSolver, HeuristicTourSolver
 
 
 class Brain:
+    # Cost given to legs that have no path. Large enough that the tour solver avoids them whenever it can.
+    UNREACHABLE_COST = 1e6
+
     def __init__(self, robot, grid):
         self.robot = robot
         self.grid = grid
 
+        # Obstacles whose targets the robot can reach, in the same order as in the cost matrix.
+        self.targets = []
+        # For each of those obstacles, the poses that the robot can reach and scan it from, in order of preference.
+        self.target_poses = dict()
+
+        # Planned legs between the start and obstacles, keyed by (from index, to index) into the cost matrix.
+        # A value of None means that there is no path for that leg.
+        self.legs = dict()
+
         # Compute the simple Hamiltonian path for all obstacles
         self.simple_hamiltonian = tuple()
+        # Legs of the planned path in order, as (obstacle, start pose, pose it is scanned from, commands).
+        self.route = []
+        # For each obstacle whose leg was planned by plan_leg, how many times the cheapest path that leg costs at
+        # most (see ModifiedAStar.start_anytime). Legs planned with the cost matrix are the cheapest.
+        self.bounds = dict()
+        # Whether the last plan is the same as it would have been without a deadline: every leg was searched for the
+        # visiting order, the tour had its usual time, and every leg is the cheapest. Plans that are not are worth
+        # planning again rather than keeping.
+        self.complete = True
 
         # Create all the commands required to finish the course.
         self.commands = deque()
 
-    def compute_simple_hamiltonian_path(self) -> Tuple[Obstacle]:
+    def compute_cost_matrix(self, deadline=None):
+        """
+        Compute the time needed to drive between every pair of points, including the start.
+
+        Index 0 is the robot's starting position, and index i (i >= 1) is the (i - 1)-th reachable obstacle in
+        self.targets. Legs start from the first pose of an obstacle, and end at whichever of the poses of the next
+        obstacle is cheapest to get to. Every leg is planned, and kept so that plan_path does not need to plan it
+        again.
+
+        If a deadline (a time.perf_counter() value) is given, only PATH_PLANNING_ORDER_SHARE of the time left is spent
+        here, so that plan_path has the rest for the legs that are needed. Once that passes, no more starts are
+        searched from, and any search still running stops. The times of the legs from those starts are estimated
+        without searching instead, and the legs are only planned by plan_path, once it is known which of them are
+        needed.
+        """
+        starts = [self.robot.pos] + [self.target_poses[obstacle][0] for obstacle in self.targets]
+        cost = [[0] * len(starts) for _ in starts]
+
+        # A single search from each start finds the legs to all poses of all other obstacles.
+        jobs = []
+        for i, start in enumerate(starts):
+            jobs.append((start, [self.target_poses[obstacle] for j, obstacle in enumerate(self.targets, 1) if j != i]))
+
+        if deadline is not None:
+            now = time.perf_counter()
+            deadline = now + settings.PATH_PLANNING_ORDER_SHARE * max(0, deadline - now)
+        if settings.PATH_PLANNING_WORKERS == 1 or len(jobs) < settings.PATH_PLANNING_MIN_POOL_SEARCHES:
+            results = []
+            for start, groups in jobs:
+                if deadline is not None and time.perf_counter() >= deadline:
+                    results.append(None)
+                else:
+                    results.append(ModifiedAStar(self.grid, start).start_group_sweep(groups, deadline))
+        else:
+            results = PlannerPool.get_shared(settings.PATH_PLANNING_WORKERS).sweep_all(self.grid, jobs, deadline)
+
+        if any(legs is None for legs in results):
+            self.complete = False
+        self.legs.clear()
+        planned_time = estimated_time = 0  # Totals over the planned legs, to compare the estimates with.
+        for i, legs in enumerate(results):
+            if legs is None:
+                continue
+            others = [j for j in range(1, len(starts)) if j != i]
+            for j, leg in zip(others, legs):
+                self.legs[i, j] = leg
+                if leg is None:
+                    cost[i][j] = self.UNREACHABLE_COST
+                else:
+                    cost[i][j] = sum(command.time for command in leg[1])
+                    planned_time += cost[i][j]
+                    estimated_time += self.estimate_time(starts[i], leg[0])
+
+        # Estimates never overestimate, so they are scaled up to match the planned legs on average. Otherwise, the
+        # tour would prefer the legs that were estimated over the ones that were planned.
+        scale = planned_time / estimated_time if planned_time and estimated_time else 1
+        for i, legs in enumerate(results):
+            if legs is None:
+                for j in range(1, len(starts)):
+                    if j != i:
+                        cost[i][j] = scale * self.estimate_time(starts[i], starts[j])
+        return cost
+
+    def estimate_time(self, start, end):
         """
-        Get the Hamiltonian Path to all points with the best possible effort.
-        This is a simple calculation where we assume that we travel directly to the next obstacle.
+        Estimate the time needed to drive from the start to the end position, without searching.
         """
-        # Generate all possible permutations for the image obstacles
-        perms = list(itertools.permutations(self.grid.obstacles))
+        lattice = self.grid.lattice
+        turns, straights = lattice.estimate_moves(lattice.get_state(start), lattice.get_state(end))
+        return turns * min(command.time for command in PRIMITIVES if isinstance(command, TurnCommand)) + \
+            straights * min(PRIMITIVES[primitive].time for primitive in STRAIGHT_PRIMITIVES)
 
-        # Get the path that has the least distance travelled.
-        def calc_distance(path):
-            # Create all target points, including the start.
-            targets = [self.robot.pos.xy_pygame()]
-            for obstacle in path:
-                targets.append(obstacle.pos.xy_pygame())
+    def plan_leg(self, start, obstacle, deadline=None, legs_left=1):
+        """
+        Plan a leg from the start to the obstacle, for a leg that was not planned with the cost matrix.
+
+        Without a deadline, this searches for the cheapest way to any of the obstacle's poses. Otherwise, the leg gets
+        an equal share of the time left, with legs_left being the number of legs still to plan including this one. An
+        anytime search to the obstacle's poses finds some path quickly, then improves it until its share runs out (or
+        right away, if there is no time left). How far from the cheapest the path might be is kept in self.bounds.
+        Returns the position reached and the commands to get there, or None if there is no path.
+        """
+        if deadline is None:
+            return ModifiedAStar(self.grid, start).start_group_sweep([self.target_poses[obstacle]])[0]
+        now = time.perf_counter()
+        astar = ModifiedAStar(self.grid, start)
+        end = astar.start_anytime(now + max(0, deadline - now) / legs_left, ends=self.target_poses[obstacle])
+        if end is None:
+            return None
+        self.bounds[obstacle] = astar.bound
+        return end, astar.commands
+
+    def get_astar(self, start, end):
+        """
+        Get the planner for the cheapest path between two poses. On large grids, this is a HierarchicalAStar, which
+        only searches near a coarse path rather than the whole grid.
+
+        This is only used by replace_obstacle, to plan a leg again to the pose that it went to before. plan_path does
+        not use it, as its legs go to any of an obstacle's poses, which a HierarchicalAStar cannot do.
+        """
+        if settings.PATH_HIERARCHICAL_MIN_CELLS is not None and \
+                self.grid.num_rows * self.grid.num_cols >= settings.PATH_HIERARCHICAL_MIN_CELLS:
+            return HierarchicalAStar(self.grid, start, end)
+        return ModifiedAStar(self.grid, start, end)
+
+    def compute_reachable_obstacles(self) -> List[Obstacle]:
+        """
+        Get the obstacles that the robot can reach a target pose of from its starting position, and store the poses
+        it can reach for each of them in self.target_poses.
+
+        This only compares the connected components of the states in the grid's lattice, so targets that cannot be
+        reached are rejected without searching for a path to them.
+        """
+        lattice = self.grid.lattice
+        start_state = lattice.get_state(self.robot.pos)
+        reachable = []
+        self.target_poses.clear()
+        for obstacle in self.grid.obstacles:
+            poses = [pose for pose in obstacle.get_robot_target_poses()
+                     if lattice.is_reachable(start_state, lattice.get_state(pose))]
+            if poses:
+                reachable.append(obstacle)
+                self.target_poses[obstacle] = poses
+            else:
+                print(f"Cannot reach any target of {obstacle}, so it is left out of the path.")
+        return reachable
 
-            dist = 0
-            for i in range(len(targets) - 1):
-                dist += math.sqrt(((targets[i][0] - targets[i + 1][0]) ** 2) +
-                                  ((targets[i][1] - targets[i + 1][1]) ** 2))
-            return dist
+    def compute_simple_hamiltonian_path(self, deadline=None) -> Tuple[Obstacle]:
+        """
+        Get the Hamiltonian Path to all reachable points with the best possible effort.
+        """
+        self.targets = self.compute_reachable_obstacles()
+        cost = self.compute_cost_matrix(deadline)
+        if len(self.targets) <= settings.TOUR_EXACT_MAX_OBSTACLES:
+            solver = HeldKarpSolver()
+        elif deadline is not None:
+            # The tour gets its share of the time left, up to its usual cap.
+            time_left = max(0, deadline - time.perf_counter())
+            solver = HeuristicTourSolver(time_limit=min(settings.TOUR_HEURISTIC_TIME_LIMIT,
+                                                        settings.PATH_PLANNING_ORDER_SHARE * time_left))
+            if solver.time_limit < settings.TOUR_HEURISTIC_TIME_LIMIT:
+                self.complete = False
+        else:
+            solver = HeuristicTourSolver()
+        tour = solver.solve(cost)
+        print(f"Tour cost is {solver.tour_cost(cost, tour):.2f}, at most {solver.gap:.1%} above optimal.")
 
-        simple = min(perms, key=calc_distance)
+        simple = tuple(self.targets[i - 1] for i in tour)
         print("Found a simple hamiltonian path:")
         for ob in simple:
             print(f"\t{ob}")
@@ -72,23 +223,132 @@ class Brain:
         self.commands = new_commands
         print("Done!")
 
-    def plan_path(self):
+    def plan_path(self, deadline=None):
+        """
+        Plan the commands to visit every obstacle.
+
+        deadline -> time.perf_counter() value by which planning should be done. If None, every leg is planned to be
+        as cheap as possible, however long that takes. Otherwise, part of the time is spent on the visiting order, and
+        each leg in it then gets an equal share of what is left (see plan_leg). Legs left once the deadline passes
+        are found as quickly as possible. self.complete tells whether any of this cut the plan short.
+        """
         print("-" * 40)
         print("STARTING PATH COMPUTATION...")
-        self.simple_hamiltonian = self.compute_simple_hamiltonian_path()
+        self.complete = True
+        self.simple_hamiltonian = self.compute_simple_hamiltonian_path(deadline)
         print()
 
+        self.route = []
+        self.bounds.clear()
         curr = self.robot.pos.copy()  # We use a copy rather than get a reference.
-        for obstacle in self.simple_hamiltonian:
-            target = obstacle.get_robot_target_pos()
-            print(f"Planning {curr} to {target}")
-            res = ModifiedAStar(self.grid, self, curr, target).start_astar()
-            if res is None:
+        prev = 0  # Index into the cost matrix of where the robot currently is.
+        at_first_pose = True  # Whether the robot is where the planned legs from prev start.
+        for legs_done, obstacle in enumerate(self.simple_hamiltonian):
+            index = self.targets.index(obstacle) + 1
+            print(f"Planning {curr} to {obstacle}")
+            if at_first_pose and (prev, index) in self.legs:
+                # The leg was already planned when computing the cost matrix.
+                leg = self.legs[prev, index]
+            else:
+                # Either the robot scanned the last obstacle from another of its poses, or there was no time to plan
+                # the legs from there with the cost matrix.
+                leg = self.plan_leg(curr, obstacle, deadline, len(self.simple_hamiltonian) - legs_done)
+            if leg is None:
                 print(f"\tNo path found from {curr} to {obstacle}")
             else:
-                print("\tPath found.")
-                curr = res
+                if obstacle in self.bounds:
+                    print(f"\tPath found, costing at most {self.bounds[obstacle]:g} times the cheapest.")
+                else:
+                    print("\tPath found.")
+                self.route.append((obstacle, curr, *leg))
+                curr, commands = leg
+                prev = index
+                at_first_pose = curr.xy_dir() == self.target_poses[obstacle][0].xy_dir()
+                self.commands.extend(commands)
                 self.commands.append(ScanCommand(settings.ROBOT_SCAN_TIME, obstacle.index))
 
+        if any(bound != 1 for bound in self.bounds.values()):
+            self.complete = False
+        self.compress_paths()
+        print("-" * 40)
+
+    def replace_obstacle(self, old: Obstacle, new: Obstacle, visited=0):
+        """
+        Update the plan when an obstacle turns out to be somewhere else, or facing another way, partway through the
+        run.
+
+        visited -> Number of obstacles on the route that the robot has already scanned. The robot is at the pose that
+        it scanned the last of them from.
+
+        Only the cells and lattice states near the two obstacles are updated, and the visiting order is kept. Legs
+        that start where the robot will be, and whose moves are all still valid, are kept as they are. A leg to an
+        obstacle that did not change is planned again to the same pose. The lattice builds a cost-to-go table for a
+        pose once it has been planned to more than once (see StateLattice.find_cost_to_go), and repairs its tables
+        rather than rebuilding them when the grid changes, so a pose that is planned to again on every change reuses
+        its table. The commands left to run from the robot's current pose replace self.commands, and are returned.
+        """
+        print("-" * 40)
+        print(f"REPLACING {old} WITH {new}...")
+        self.grid.remove_obstacle(old)
+        self.grid.add_obstacle(new)
+        lattice = self.grid.lattice
+
+        done, remaining = self.route[:visited], self.route[visited:]
+        curr = done[-1][2] if done else self.robot.pos.copy()
+        start_state = lattice.get_state(curr)
+
+        # Swap in the new obstacle everywhere that the old one was used.
+        if old in self.targets:
+            index = self.targets.index(old) + 1
+            self.legs = {key: leg for key, leg in self.legs.items() if index not in key}
+            self.targets[index - 1] = new
+        self.target_poses.pop(old, None)
+        tour = [new if obstacle is old else obstacle for obstacle in self.simple_hamiltonian]
+        if new not in tour:
+            # It could not be reached before, but it might be now.
+            tour.append(new)
+        self.simple_hamiltonian = tuple(tour)
+
+        legs = {obstacle: (start, end, commands) for obstacle, start, end, commands in remaining}
+        visited_obstacles = [obstacle for obstacle, *_ in done]
+        self.route = done
+        self.commands = deque()
+        kept = replanned = reused = 0
+        for obstacle in tour:
+            if obstacle in visited_obstacles:
+                continue
+            poses = [pose for pose in obstacle.get_robot_target_poses()
+                     if lattice.is_reachable(start_state, lattice.get_state(pose))]
+            if not poses:
+                print(f"\tCannot reach any target of {obstacle}, so it is left out of the path.")
+                continue
+            self.target_poses[obstacle] = poses
+
+            leg = legs.get(obstacle)
+            if leg is not None and leg[0].xy_dir() == curr.xy_dir() and \
+                    lattice.get_end_state(lattice.get_state(curr), leg[2]) == lattice.get_state(leg[1]):
+                end, commands = leg[1], leg[2]
+                kept += 1
+            else:
+                if leg is not None and any(pose.xy_dir() == leg[1].xy_dir() for pose in poses):
+                    reused += lattice.get_state(leg[1]) in lattice.cost_to_go_cache
+                    astar = self.get_astar(curr, leg[1])
+                    end = astar.start_astar()
+                    commands = astar.commands
+                else:
+                    result = ModifiedAStar(self.grid, curr).start_group_sweep([poses])[0]
+                    end, commands = (None, None) if result is None else result
+                if end is None:
+                    print(f"\tNo path found from {curr} to {obstacle}")
+                    continue
+                replanned += 1
+
+            self.route.append((obstacle, curr, end, commands))
+            curr = end
+            self.commands.extend(commands)
+            self.commands.append(ScanCommand(settings.ROBOT_SCAN_TIME, obstacle.index))
+
+        print(f"Kept {kept} legs, and planned {replanned} legs again, {reused} of them with a repaired table.")
         self.compress_paths()
         print("-" * 40)
+        return self.commands
@@ -0,0 +1,157 @@
+import heapq
+import math
+
+from algorithm import settings
+from algorithm.entities.grid.grid import Grid
+from algorithm.entities.grid.position import RobotPosition
+from algorithm.entities.grid.state_lattice import StateLattice
+from algorithm.entities.robot.brain.mod_a_star import ModifiedAStar
+
+# Directions that the coarse search can move in, as (row, column) offsets.
+BLOCK_DIRECTIONS = ((0, 1), (1, 0), (0, -1), (-1, 0))
+
+
+class HierarchicalAStar:
+    """
+    Coarse-to-fine planner for large arenas, used in the same way as ModifiedAStar.start_astar. It is only used when
+    an obstacle is replaced partway through a run (see Brain.get_astar), and not for the first plan.
+
+    The grid is first split into square blocks, and a path of blocks is found from the start to the end. The full
+    search is then only done on a lattice limited to the cells near that path. Its tables only hold the states of
+    those cells, and only the obstacles near them are checked, so the rest of the grid is never searched.
+
+    The path found can cost more than the one from ModifiedAStar if the cheapest path leaves the corridor. If no path
+    is found in the corridor, the whole grid is searched instead, so a path is only missed if there is none.
+    """
+    def __init__(self, grid, start: RobotPosition, end: RobotPosition,
+                 factor=settings.PATH_COARSE_FACTOR,
+                 corridor_width=settings.PATH_CORRIDOR_WIDTH):
+        """
+        factor -> Number of cells along each side of a block.
+        corridor_width -> Number of blocks either side of the block path that are searched in full detail.
+        """
+        self.grid: Grid = grid
+        self.start = start
+        self.end = end
+        self.factor = factor
+        self.corridor_width = corridor_width
+
+        # Commands needed to get from start to end. Only filled in once a path is found.
+        self.commands = []
+
+        # Cells that the full search was limited to in the last search.
+        self.corridor = set()
+        # Number of states expanded by the full searches.
+        self.expansions = 0
+
+    def get_block(self, pos: RobotPosition):
+        cell = self.grid.occupancy.get_cell(*pos.xy())
+        if cell is None:
+            return None
+        row, col = cell
+        return row // self.factor, col // self.factor
+
+    def compute_blocked_counts(self):
+        """
+        Get the number of blocked cells in every block that has at least one free cell, keyed by (row, column) of
+        the block.
+        """
+        occupancy = self.grid.occupancy
+        blocked = dict()
+        free = set()
+        for row in range(occupancy.num_rows):
+            for col_start in range(0, occupancy.num_cols, self.factor):
+                block = row // self.factor, col_start // self.factor
+                col_stop = min(occupancy.num_cols, col_start + self.factor)
+                free_cells = occupancy.count_free_cells(row, col_start, col_stop)
+                blocked[block] = blocked.get(block, 0) + col_stop - col_start - free_cells
+                if free_cells:
+                    free.add(block)
+        return {block: count for block, count in blocked.items() if block in free}
+
+    def find_block_path(self):
+        """
+        Find a path of blocks from the start to the end, or None if there is none.
+
+        Moving into a block costs more the more of its cells are blocked, and changing direction costs as much as
+        crossing a few full blocks, as turns take far longer than driving straight. The robot can then usually follow
+        the path with few turns.
+        """
+        start, end = self.get_block(self.start), self.get_block(self.end)
+        blocked = self.compute_blocked_counts()
+        if start not in blocked or end not in blocked:
+            return None
+        turn_cost = 4 * self.factor * self.factor
+
+        # Search states are (block, direction moved to get into it). The start has no direction.
+        frontier = [(0, 0, start, None)]
+        backtrack = {(start, None): None}
+        cost = {(start, None): 0}
+        offset = 0  # Used to tie-break.
+        while frontier:
+            current_cost, _, block, direction = heapq.heappop(frontier)
+            if current_cost > cost[block, direction]:
+                # Outdated entry, as a cheaper way here was found after it was added.
+                continue
+            if block == end:
+                path = []
+                key = block, direction
+                while key is not None:
+                    path.append(key[0])
+                    key = backtrack[key]
+                return path
+
+            for new_direction in BLOCK_DIRECTIONS:
+                new_block = block[0] + new_direction[0], block[1] + new_direction[1]
+                if new_block not in blocked:
+                    continue
+                new_cost = current_cost + self.factor + blocked[new_block]
+                if direction is not None and new_direction != direction:
+                    new_cost += turn_cost
+                if new_cost < cost.get((new_block, new_direction), math.inf):
+                    cost[new_block, new_direction] = new_cost
+                    backtrack[new_block, new_direction] = block, direction
+                    offset += 1
+                    heapq.heappush(frontier, (new_cost, offset, new_block, new_direction))
+        return None
+
+    def compute_corridor(self, path):
+        """
+        Get the set of cells (as row * number of columns + column) within corridor_width blocks of the block path.
+        """
+        occupancy = self.grid.occupancy
+        blocks = set()
+        for row, col in path:
+            for d_row in range(-self.corridor_width, self.corridor_width + 1):
+                for d_col in range(-self.corridor_width, self.corridor_width + 1):
+                    blocks.add((row + d_row, col + d_col))
+
+        cells = set()
+        for row, col in blocks:
+            for cell_row in range(max(0, row * self.factor), min(occupancy.num_rows, (row + 1) * self.factor)):
+                for cell_col in range(max(0, col * self.factor), min(occupancy.num_cols, (col + 1) * self.factor)):
+                    cells.add(cell_row * occupancy.num_cols + cell_col)
+        return cells
+
+    def start_astar(self):
+        self.expansions = 0
+        path = self.find_block_path()
+        end = None
+        if path is not None:
+            self.corridor = self.compute_corridor(path)
+            astar = ModifiedAStar(self.grid, self.start, self.end, StateLattice(self.grid, self.corridor))
+            end = astar.start_astar()
+            self.expansions += astar.expansions
+
+        if end is None:
+            # The robot may still get there in ways that the blocks do not show, such as around the corners of
+            # blocks, so try again on the whole grid.
+            print("No path found near the coarse path, searching the whole grid...")
+            astar = ModifiedAStar(self.grid, self.start, self.end)
+            end = astar.start_astar()
+            self.expansions += astar.expansions
+            if end is None:
+                return None
+
+        self.commands = astar.commands
+        return end
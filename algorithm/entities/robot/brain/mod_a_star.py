@@ -1,149 +1,516 @@
+import heapq
 import math
-from queue import PriorityQueue
-from typing import List, Tuple
+import time
+from typing import List
 
 from algorithm import settings
-from algorithm.entities.commands.command import Command
-from algorithm.entities.commands.straight_command import StraightCommand
-from algorithm.entities.commands.turn_command import TurnCommand
 from algorithm.entities.grid.grid import Grid
-from algorithm.entities.grid.node import Node
 from algorithm.entities.grid.position import RobotPosition
+from algorithm.entities.grid.state_lattice import HEADINGS, PRIMITIVES, STRAIGHT_PRIMITIVES, StateLattice
+
+# The backtrack tree stores the parent state and the move from it in a single int, as (parent << MOVE_BITS) | move.
+# A move of the same primitive many times in a row is stored as (times - 1) * len(PRIMITIVES) + primitive index.
+MOVE_BITS = 16
+# How many states a search expands between checks of its deadline.
+DEADLINE_CHECK_INTERVAL = 256
+# Weight of the heuristic once the anytime search runs out of time before finding a path. This is so high that the
+# search just heads for the end, without caring about the cost so far.
+GREEDY_WEIGHT = 1e6
 
 
 class ModifiedAStar:
-    def __init__(self, grid, brain, start: RobotPosition, end: RobotPosition):
-        # We use a copy of the grid rather than use a reference
-        # to the exact grid.
-        self.grid: Grid = grid.copy()
-        self.brain = brain
+    def __init__(self, grid, start: RobotPosition, end: RobotPosition = None, lattice: StateLattice = None):
+        # The grid is never changed by the search, so it is shared rather than copied.
+        self.grid: Grid = grid
+        # Movements between states are looked up from a state lattice, rather than being simulated. This is the
+        # grid's own lattice unless another one (such as one limited to some of the cells) is given.
+        self.lattice = grid.lattice if lattice is None else lattice
 
         self.start = start
         self.end = end
 
-    def get_neighbours(self, pos: RobotPosition) -> List[Tuple[Node, RobotPosition, int, Command]]:
-        """
-        Get movement neighbours from this position.
-
-        Note that all values in the Position object (x, y, direction) are all with respect to the grid!
-
-        We also expect the return Positions to be with respect to the grid.
-        """
-        # We assume the robot will always make a full 90-degree turn to the next neighbour, and that it will travel
-        # a fix distance of 10 when travelling straight.
-        neighbours = []
-
-        # Check travel straights.
-        straight_dist = 10 * settings.SCALING_FACTOR
-        straight_commands = [
-            StraightCommand(straight_dist),
-            StraightCommand(-straight_dist)
-        ]
-        for c in straight_commands:
-            # Check if doing this command does not bring us to any invalid position.
-            after, p = self.check_valid_command(c, pos)
-            if after:
-                neighbours.append((after, p, straight_dist, c))
-
-        # Check turns
-        turn_penalty = settings.PATH_TURN_COST
-        turn_commands = [
-            TurnCommand(90, False),  # Forward right turn
-            TurnCommand(-90, False),  # Forward left turn
-            TurnCommand(90, True),  # Reverse with wheels to right.
-            TurnCommand(-90, True),  # Reverse with wheels to left.
-        ]
-        for c in turn_commands:
-            # Check if doing this command does not bring us to any invalid position.
-            after, p = self.check_valid_command(c, pos)
-            if after:
-                neighbours.append((after, p, turn_penalty, c))
-        return neighbours
-
-    def check_valid_command(self, command: Command, p: RobotPosition):
-        """
-        Checks if a command will bring a point into any invalid position.
-
-        If invalid, we return None for both the resulting grid location and the resulting position.
-        """
-        # Check specifically for validity of turn command.
-        p = p.copy()
-        if isinstance(command, TurnCommand):
-            p_c = p.copy()
-            for tick in range(command.ticks // settings.PATH_TURN_CHECK_GRANULARITY):
-                tick_command = TurnCommand(command.angle / (command.ticks // settings.PATH_TURN_CHECK_GRANULARITY),
-                                           command.rev)
-                tick_command.apply_on_pos(p_c)
-                if not (self.grid.check_valid_position(p_c) and self.grid.get_coordinate_node(*p_c.xy())):
-                    return None, None
-        command.apply_on_pos(p)
-        if self.grid.check_valid_position(p) and (after := self.grid.get_coordinate_node(*p.xy())):
-            after.pos.direction = p.direction
-            return after.copy(), p
-        return None, None
-
-    def heuristic(self, curr_pos: RobotPosition):
-        """
-        Measure the difference in distance between the provided position and the
-        end position.
-        """
-        dx = abs(curr_pos.x - self.end.x)
-        dy = abs(curr_pos.y - self.end.y)
-        return math.sqrt(dx ** 2 + dy ** 2)
-
-    def start_astar(self):
-        frontier = PriorityQueue()  # Store frontier nodes to travel to.
-        backtrack = dict()  # Store the sequence of nodes being travelled.
-        cost = dict()  # Store the cost to travel from start to a node.
-
-        # We can check what the goal node is
-        goal_node = self.grid.get_coordinate_node(*self.end.xy()).copy()  # Take note of copy!
-        goal_node.pos.direction = self.end.direction  # Set the required direction at this node.
-
-        # Add starting node set into the frontier.
-        start_node: Node = self.grid.get_coordinate_node(*self.start.xy()).copy()  # Take note of copy!
-        start_node.direction = self.start.direction  # Make the node know which direction the robot is facing.
+        # Commands needed to get from start to end. Only filled in once a path is found.
+        self.commands = []
+
+        # Goal states that the heuristic measures the cost to, which is the end's state unless an anytime search is
+        # given many ends.
+        self.goal_states = []
+        # Cost of the cheapest path from every state to the goal, used as the heuristic. Only filled in by a search
+        # that uses the heuristic, and only if the lattice has the table (see StateLattice.find_cost_to_go).
+        self.cost_to_go = None
+        # Otherwise, the lattice's estimates of the same, kept as the same states are estimated many times.
+        self.estimates = dict()
+
+        # Number of states expanded and added to the frontier in the last search.
+        self.expansions = 0
+        self.pushes = 0
+        # Whether the last search stopped because its deadline passed.
+        self.timed_out = False
+
+        # After an anytime search, the path found is at most this many times the cost of the cheapest path.
+        self.bound = 1
+
+    def heuristic(self, state):
+        """
+        Measure the cost of travelling from the provided state to the end position (or the nearest of the goal
+        states, if there are many).
+
+        If the lattice has a cost-to-go table for the end, this is looked up from it. The table is from a backwards
+        search from the end over the state lattice, so it accounts for obstacles and turns, and is exact. Otherwise,
+        it is the lattice's cheap estimate, which only counts the turns and straight moves needed. Neither ever
+        overestimates.
+        """
+        if self.cost_to_go is not None:
+            return self.cost_to_go[state]
+        if state not in self.estimates:
+            self.estimates[state] = min(self.lattice.estimate_cost(state, goal_state)
+                                        for goal_state in self.goal_states)
+        return self.estimates[state]
+
+    def get_macro_moves(self, state, end_row, end_col):
+        """
+        Get the (new state, cost, move) of straight moves of many steps from a state, in the spirit of jump point
+        search. These go as far as possible before a blocked cell, or up to the row or column of the end. As a turn
+        moves the robot two cells along both the rows and the columns, they also go up to two cells either side of
+        the end's row or column, where the last turn can be made.
+
+        Every macro move costs the same as making its steps one at a time, so using them does not change the cost of
+        the cheapest path, but it can be reached with far fewer expansions.
+        """
+        macro_moves = []
+        heading = state % len(HEADINGS)
+        row, col = divmod(state // len(HEADINGS), self.lattice.num_cols)
+        for primitive, runs in zip(STRAIGHT_PRIMITIVES, self.lattice.runs):
+            run = runs[state]
+            if run < 2:
+                continue
+            move = self.lattice.moves[heading][primitive]
+            # Straight moves go one cell along either a row or a column.
+            to_end = (end_col - col) * move.d_col if move.d_col else (end_row - row) * move.d_row
+            step = self.lattice.get_straight_step(heading, primitive)
+            for times in {run} | {times for times in (to_end - 2, to_end, to_end + 2) if 1 < times < run}:
+                macro_moves.append((state + times * step, times * move.weight,
+                                    (times - 1) * len(PRIMITIVES) + primitive))
+        return macro_moves
+
+    def search(self, goal_groups, use_heuristic=True, use_macros=False, rank_penalty=0, deadline=None):
+        """
+        Search from the start until one goal state from every group has been reached, or until there is nothing left
+        to search.
+
+        The heuristic is only useful when there is a single goal state, which must be at the end position. Macro
+        moves (see get_macro_moves) also need the end position.
+
+        Goal states are listed in order of preference within each group, and each place further down its group adds
+        rank_penalty to the cost of reaching a goal state. A group is only done once none of its goal states could be
+        reached more cheaply, counting the penalties.
+
+        If a deadline (a time.perf_counter() value) is given, the search stops once it passes, and sets
+        self.timed_out. Groups that were not done by then are None.
+
+        Returns, for each group, its goal state that is cheapest to get to, or None if none of them can be reached.
+        Also returns the backtrack tree of the search, from which the commands to get to any of the reached states can
+        be extracted.
+        """
+        frontier = []  # Heap of frontier states to travel to. Outdated entries are skipped when popped.
+        closed = set()  # States that have already been expanded, and so already have their lowest cost.
+        backtrack = dict()  # Store the sequence of states being travelled.
+        cost = dict()  # Store the cost to travel from start to a state.
+        reached = [None] * len(goal_groups)
+        self.timed_out = False
+        # For each group whose best goal state so far might still be beaten, (cost with penalty, goal state).
+        pending = dict()
+
+        # Add starting state into the frontier.
+        start_state = self.lattice.get_state(self.start)
+        # The groups of every goal state whose groups have not been reached yet, and its place in each of them. Goals
+        # that cannot be reached at all are left out, so that the search stops as soon as the rest are reached,
+        # rather than searching everything else first.
+        remaining = dict()
+        for index, group in enumerate(goal_groups):
+            for rank, goal_state in enumerate(group):
+                if self.lattice.is_reachable(start_state, goal_state):
+                    remaining.setdefault(goal_state, dict()).setdefault(index, rank)
+        if not remaining:
+            return reached, backtrack
+        if use_heuristic:
+            self.goal_states, self.estimates = [self.lattice.get_state(self.end)], dict()
+            self.cost_to_go = self.lattice.find_cost_to_go(self.goal_states[0])
+        if use_macros:
+            end_row, end_col = divmod(self.lattice.get_state(self.end) // len(HEADINGS), self.lattice.num_cols)
 
         offset = 0  # Used to tie-break.
-        frontier.put((0, offset, (start_node, self.start)))  # Extra time parameter to tie-break same priority.
-        cost[start_node] = 0
-        # Having None as the parent means this key is the starting node.
-        backtrack[start_node] = (None, None)  # Parent, Command
-
-        while not frontier.empty():  # While there are still nodes to process.
-            # Get the highest priority node.
-            priority, _, (current_node, current_position) = frontier.get()
-            # If the current node is our goal.
-            if current_node == goal_node:
-                # Get the commands needed to get to destination.
-                self.extract_commands(backtrack, goal_node)
-                return current_position
+        # Entries are (priority, heuristic, offset, state). Among entries of the same priority, the one closest to the
+        # end is taken first, and then the one added first.
+        heapq.heappush(frontier, (0, 0, offset, start_state))
+        self.pushes, self.expansions = 1, 0
+        cost[start_state] = 0
+        # Having -1 as the parent means this key is the starting state.
+        backtrack[start_state] = -1
+
+        while frontier:  # While there are still states to process.
+            # Get the highest priority state.
+            priority, _, _, current_state = heapq.heappop(frontier)
+            if current_state in closed:
+                # We found a cheaper way to this state after this entry was added, and have already expanded it.
+                continue
+            closed.add(current_state)
+            self.expansions += 1
+            if deadline is not None and self.expansions % DEADLINE_CHECK_INTERVAL == 0 and \
+                    time.perf_counter() >= deadline:
+                self.timed_out = True
+                return reached, backtrack
+
+            # If the current state is one of our goals, it is the best so far of any of its groups that it is
+            # cheaper for. Every state left costs at least as much as this one, so any group whose best goal so far
+            # costs no more than that (counting the penalty) is done, and its other goals are not needed.
+            if current_state in remaining:
+                for index, rank in remaining.pop(current_state).items():
+                    penalised_cost = cost[current_state] + rank * rank_penalty
+                    if index not in pending or penalised_cost < pending[index][0]:
+                        pending[index] = penalised_cost, current_state
+            if pending:
+                for index in [index for index, (penalised_cost, _) in pending.items() if penalised_cost <= priority]:
+                    reached[index] = pending.pop(index)[1]
+                    for goal_state in goal_groups[index]:
+                        if goal_state in remaining:
+                            remaining[goal_state].pop(index, None)
+                            if not remaining[goal_state]:
+                                del remaining[goal_state]
+                if not remaining and not pending:
+                    break
 
             # Otherwise, we check through all possible locations that we can
-            # travel to from this node.
-            for new_node, new_pos, weight, c in self.get_neighbours(current_position):
-                new_cost = cost.get(current_node) + weight
+            # travel to from this state.
+            current_cost = cost[current_state]
+            moves = self.lattice.successors[current_state]
+            if use_macros:
+                moves = moves + tuple(self.get_macro_moves(current_state, end_row, end_col))
+            for new_state, weight, move in moves:
+                if new_state in closed:
+                    continue
+                new_cost = current_cost + weight
+
+                if new_state not in cost or new_cost < cost[new_state]:
+                    estimate = 0
+                    if use_heuristic:
+                        estimate = self.heuristic(new_state)
+                        if estimate == math.inf:
+                            # The end cannot be reached from this state, so there is no point in searching it.
+                            continue
+
+                    # Rather than decreasing the priority of an existing entry, we add a new one.
+                    offset += 1
+                    heapq.heappush(frontier, (new_cost + estimate, estimate, offset, new_state))
+                    self.pushes += 1
+                    backtrack[new_state] = (current_state << MOVE_BITS) | move
+                    cost[new_state] = new_cost
+
+        # Nothing left to search, so the best goals so far are the best there are.
+        for index, (_, goal_state) in pending.items():
+            reached[index] = goal_state
+        return reached, backtrack
+
+    def search_bidirectional(self, goal_state):
+        """
+        Search forwards from the start and backwards from the goal state at the same time, until the two searches
+        meet. The backward search follows the reversed movements in the lattice's predecessors table.
+
+        Each step expands a state from whichever search has the smaller frontier. The searches stop once no path
+        through the remaining frontiers can be cheaper than the best path found so far, so the path is as cheap as
+        the one found by search.
+
+        Returns the state where the cheapest path crosses from one search to the other (None if the goal cannot be
+        reached), and the backtrack trees of the forward and backward searches.
+        """
+        start_state = self.lattice.get_state(self.start)
+        tables = (self.lattice.successors, self.lattice.predecessors)
+        frontiers = ([(0, 0, start_state)], [(0, 0, goal_state)])
+        closed = (set(), set())
+        # The backward tree stores, for each state, the next state towards the goal and the move to get there.
+        backtracks = ({start_state: -1}, {goal_state: -1})
+        costs = ({start_state: 0}, {goal_state: 0})
+        self.pushes, self.expansions = 2, 0
 
-                if new_node not in backtrack or new_cost < cost[new_node]:
+        best_cost, meeting_state = (0, start_state) if start_state == goal_state else (math.inf, None)
+        offset = 0  # Used to tie-break.
+        while frontiers[0] and frontiers[1]:
+            if frontiers[0][0][0] + frontiers[1][0][0] >= best_cost:
+                # Any path not found yet must cost at least this much.
+                break
+
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            frontier, cost, backtrack = frontiers[side], costs[side], backtracks[side]
+            other_cost = costs[1 - side]
+
+            _, _, current_state = heapq.heappop(frontier)
+            if current_state in closed[side]:
+                continue
+            closed[side].add(current_state)
+            self.expansions += 1
+
+            current_cost = cost[current_state]
+            for new_state, weight, move in tables[side][current_state]:
+                if new_state in closed[side]:
+                    continue
+                new_cost = current_cost + weight
+
+                if new_state not in cost or new_cost < cost[new_state]:
                     offset += 1
-                    priority = new_cost + self.heuristic(new_pos)
+                    heapq.heappush(frontier, (new_cost, offset, new_state))
+                    self.pushes += 1
+                    backtrack[new_state] = (current_state << MOVE_BITS) | move
+                    cost[new_state] = new_cost
+
+                    # Check if this joins up with the other search into a cheaper path.
+                    if new_state in other_cost and new_cost + other_cost[new_state] < best_cost:
+                        best_cost = new_cost + other_cost[new_state]
+                        meeting_state = new_state
+        return meeting_state, backtracks[0], backtracks[1]
+
+    def start_astar(self, bidirectional=False):
+        """
+        Find the cheapest path from the start to the end.
+
+        bidirectional -> If True, search from both ends at the same time rather than using the heuristic. The path
+        found costs the same either way, but may take different moves when there are many equally cheap paths.
+        """
+        goal_state = self.lattice.get_state(self.end)
+        if not self.lattice.is_reachable(self.lattice.get_state(self.start), goal_state):
+            # No need to search, as the end is not connected to the start.
+            return None
+        if bidirectional:
+            meeting_state, forward, backward = self.search_bidirectional(goal_state)
+            if meeting_state is None:
+                return None
+            self.commands = self.extract_commands(forward, meeting_state) + \
+                self.extract_commands_from(backward, meeting_state)
+            return self.lattice.get_position(goal_state)
 
-                    frontier.put((priority, offset, (new_node, new_pos)))
-                    backtrack[new_node] = (current_node, c)
-                    cost[new_node] = new_cost
-        # If we are here, means that there was no path that we could find.
-        # We return None to show that we cannot find a path.
-        return None
+        reached, backtrack = self.search([[goal_state]], use_macros=True)
+        if reached[0] is None:
+            # If we are here, means that there was no path that we could find.
+            # We return None to show that we cannot find a path.
+            return None
 
-    def extract_commands(self, backtrack, goal_node):
+        # Get the commands needed to get to destination.
+        self.commands = self.extract_commands(backtrack, goal_state)
+        return self.lattice.get_position(goal_state)
+
+    def start_anytime(self, deadline,
+                      initial_weight=settings.PATH_ANYTIME_INITIAL_WEIGHT,
+                      weight_step=settings.PATH_ANYTIME_WEIGHT_STEP,
+                      ends: List[RobotPosition] = None):
+        """
+        Find a path from the start to the end quickly, then keep improving it until the deadline (ARA*).
+
+        The first search inflates the heuristic by initial_weight, which finds a path with few expansions. Each later
+        search lowers the weight by weight_step, and carries on from where the last one stopped rather than starting
+        again. The search stops once the weight reaches 1 (the path is then the cheapest one), or once the deadline
+        (a time.perf_counter() value) passes.
+
+        If the deadline passes before any path is found, the rest of the search only follows the heuristic, to find
+        some valid path as quickly as possible. So a path is always found if there is one, even after the deadline.
+
+        ends -> Positions that will each do as the end, instead of the end. The path goes to whichever of them it is
+        cheapest to get to, as far as the searches can tell.
+
+        The heuristic is the end's cost-to-go table if the lattice already has it, as it is exact. Otherwise, it is
+        the lattice's cheap estimate, as building the table takes a whole search of the lattice.
+
+        Afterwards, self.bound is the weight of the last search that finished, and the path costs at most that many
+        times as much as the cheapest path.
+        """
+        start_state = self.lattice.get_state(self.start)
+        goal_states = {self.lattice.get_state(end) for end in ([self.end] if ends is None else ends)}
+        goal_states = {goal_state for goal_state in goal_states if self.lattice.is_reachable(start_state, goal_state)}
+        if not goal_states:
+            return None
+        self.goal_states, self.estimates = list(goal_states), dict()
+        self.cost_to_go = None
+        if len(goal_states) == 1:
+            self.cost_to_go = self.lattice.cost_to_go_cache.get(self.goal_states[0])
+        heuristic = self.heuristic
+
+        backtrack = {start_state: -1}
+        cost = {start_state: 0}
+        opened = {start_state}  # States in the frontier. Entries in the heap for other states are outdated.
+        closed = set()  # States expanded in the current search.
+        inconsistent = set()  # States whose cost dropped after they were expanded in the current search.
+        frontier = [(initial_weight * heuristic(start_state), start_state)]
+        self.pushes, self.expansions = 1, 0
+
+        def restart(new_weight):
+            # Search again from every state that could still lead to a cheaper path.
+            opened.update(inconsistent)
+            inconsistent.clear()
+            closed.clear()
+            frontier[:] = [(cost[state] + new_weight * heuristic(state), state) for state in opened]
+            heapq.heapify(frontier)
+
+        def get_reached():
+            # Goal state that is cheapest to get to so far, or None if none of them have been reached.
+            goal_state = min(goal_states, key=lambda state: cost.get(state, math.inf))
+            return goal_state if goal_state in cost else None
+
+        weight = initial_weight
+        self.bound = math.inf
+        while True:
+            finished = self.improve_path(weight, heuristic, goal_states, frontier, opened, closed, inconsistent, cost,
+                                         backtrack, deadline)
+            if not finished and get_reached() is None:
+                # Out of time without a path, so only the heuristic is followed from now on.
+                weight = GREEDY_WEIGHT
+                restart(weight)
+                finished = self.improve_path(weight, heuristic, goal_states, frontier, opened, closed, inconsistent,
+                                             cost, backtrack, None)
+            goal_state = get_reached()
+            if goal_state is None:
+                # Nothing left to search, and the end was never reached.
+                return None
+            self.commands = self.extract_commands(backtrack, goal_state)
+            if finished:
+                self.bound = weight
+            if not finished or weight <= 1 or time.perf_counter() >= deadline:
+                break
+
+            weight = max(1, weight - weight_step)
+            restart(weight)
+        return self.lattice.get_position(goal_state)
+
+    def improve_path(self, weight, heuristic, goal_states, frontier, opened, closed, inconsistent, cost, backtrack,
+                     deadline):
+        """
+        Run one search of start_anytime, with the heuristic inflated by weight, changing the given search state in
+        place. The deadline is not checked if it is None.
+
+        Returns False if the search stopped because of the deadline, and True otherwise.
+        """
+        best_cost = min(cost.get(goal_state, math.inf) for goal_state in goal_states)
+        while frontier:
+            priority, current_state = frontier[0]
+            if current_state not in opened or \
+                    priority != cost[current_state] + weight * heuristic(current_state):
+                # Outdated entry, as the state was expanded or got cheaper after it was added.
+                heapq.heappop(frontier)
+                continue
+            if priority >= best_cost:
+                # No state left in the frontier can lead to a cheaper path at this weight.
+                return True
+            if deadline is not None and self.expansions % DEADLINE_CHECK_INTERVAL == 0 and \
+                    time.perf_counter() >= deadline:
+                return False
+
+            heapq.heappop(frontier)
+            opened.remove(current_state)
+            closed.add(current_state)
+            self.expansions += 1
+
+            current_cost = cost[current_state]
+            for new_state, move_weight, move in self.lattice.successors[current_state]:
+                estimate = heuristic(new_state)
+                if estimate == math.inf:
+                    continue
+                new_cost = current_cost + move_weight
+                if new_cost < cost.get(new_state, math.inf):
+                    cost[new_state] = new_cost
+                    backtrack[new_state] = (current_state << MOVE_BITS) | move
+                    if new_state in goal_states:
+                        best_cost = min(best_cost, new_cost)
+                    if new_state in closed:
+                        inconsistent.add(new_state)
+                    else:
+                        opened.add(new_state)
+                        heapq.heappush(frontier, (new_cost + weight * estimate, new_state))
+                        self.pushes += 1
+        return True
+
+    def start_sweep(self, targets: List[RobotPosition]):
+        """
+        Search outwards from the start (Dijkstra's algorithm) until every target position has been reached.
+
+        This finds the paths to many targets in a single search, rather than one search for each target. The end
+        position is not used.
+
+        Returns, for each target, either the position reached and the commands needed to get there, or None if the
+        target cannot be reached.
+        """
+        return self.start_group_sweep([[target] for target in targets])
+
+    def start_group_sweep(self, target_groups: List[List[RobotPosition]], deadline=None):
+        """
+        Same as start_sweep, but each target is a group of positions, and any one of them will do. The search stops
+        at the first position of each group that is reached, which is the cheapest one to get to, so the search
+        costs about the same no matter how many positions each group has.
+
+        Returns, for each group, either the position reached and the commands needed to get there, or None if none
+        of its positions can be reached. If a deadline (a time.perf_counter() value) is given and passes before the
+        search is done, returns None instead.
+        """
+        sweep = self.start_group_sweep_moves(target_groups, deadline)
+        if sweep is None:
+            return None
+        results = []
+        for result in sweep:
+            if result is not None:
+                goal_state, moves = result
+                results.append((self.lattice.get_position(goal_state), self.get_move_commands(moves)))
+            else:
+                results.append(None)
+        return results
+
+    def start_group_sweep_moves(self, target_groups: List[List[RobotPosition]], deadline=None):
+        """
+        Same as start_group_sweep, but returns the state reached and the moves (as in the backtrack tree) to get
+        there, rather than the position and the commands. These are plain ints, so they are cheap to send between
+        processes.
+        """
+        goal_groups = [[self.lattice.get_state(target) for target in group] for group in target_groups]
+        reached, backtrack = self.search(goal_groups, use_heuristic=False,
+                                         rank_penalty=settings.PATH_TARGET_RANK_PENALTY, deadline=deadline)
+        if self.timed_out:
+            return None
+        return [None if goal_state is None else (goal_state, self.extract_moves(backtrack, goal_state))
+                for goal_state in reached]
+
+    def extract_commands(self, backtrack, goal_state):
         """
         Extract required commands to get to destination.
         """
+        return self.get_move_commands(self.extract_moves(backtrack, goal_state))
+
+    @classmethod
+    def extract_moves(cls, backtrack, goal_state):
+        """
+        Extract the moves from the start to the goal state, in order, from a backtrack tree.
+        """
+        moves = []
+        curr = backtrack[goal_state]
+        while curr != -1:
+            moves.append(curr & ((1 << MOVE_BITS) - 1))
+            curr = backtrack[curr >> MOVE_BITS]
+        moves.reverse()
+        return moves
+
+    def extract_commands_from(self, backtrack, state):
+        """
+        Extract required commands to get from a state to the destination, using the backtrack tree of a backward
+        search.
+        """
+        moves = []
+        curr = backtrack[state]
+        while curr != -1:
+            moves.append(curr & ((1 << MOVE_BITS) - 1))
+            curr = backtrack[curr >> MOVE_BITS]
+        return self.get_move_commands(moves)
+
+    @classmethod
+    def get_move_commands(cls, moves):
+        """
+        Get the commands for a list of moves from a backtrack tree, with each macro move as its separate steps.
+        """
         commands = []
-        curr = goal_node
-        while curr:
-            curr, c = backtrack.get(curr, (None, None))
-            if c:
-                commands.append(c)
-        commands.reverse()
-        self.brain.commands.extend(commands)
+        for move in moves:
+            times, primitive = divmod(move, len(PRIMITIVES))
+            commands.extend([PRIMITIVES[primitive]] * (times + 1))
+        return commands
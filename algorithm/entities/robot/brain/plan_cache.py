@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import List, Optional
+
+from algorithm import settings
+from algorithm.entities.files import write_atomically
+from algorithm.entities.grid.obstacle import Obstacle
+
+# Bump this whenever a change to the planning gives different commands for the same layout, so that plans saved by
+# older code are not used.
+PLAN_CACHE_VERSION = 1
+# Settings that change the geometry or the costs that the commands are planned with, and so are part of the key.
+# Settings that only change how long planning takes, or where things are saved, are left out.
+KEY_SETTINGS = (
+    "SCALING_FACTOR",
+    "ROBOT_LENGTH", "ROBOT_TURN_RADIUS", "ROBOT_SPEED_PER_SECOND", "ROBOT_S_FACTOR", "ROBOT_SAFETY_DISTANCE",
+    "ROBOT_SCAN_TIME",
+    "GRID_LENGTH", "GRID_CELL_LENGTH", "GRID_START_BOX_LENGTH", "GRID_NUM_GRIDS",
+    "OBSTACLE_LENGTH", "OBSTACLE_SAFETY_WIDTH", "OBSTACLE_TARGET_EXTRA_DISTANCES", "OBSTACLE_TARGET_SIDE_OFFSETS",
+    "PATH_TURN_COST", "PATH_TARGET_RANK_PENALTY", "PATH_COARSE_FACTOR", "PATH_CORRIDOR_WIDTH",
+    "PATH_HIERARCHICAL_MIN_CELLS",
+    "TOUR_EXACT_MAX_OBSTACLES", "TOUR_HEURISTIC_MAX_ITERATIONS",
+)
+
+
+class PlanCache:
+    """
+    Commands planned for each obstacle layout, so that a layout that is sent again does not need to be planned again.
+
+    At most size layouts are kept, and the least recently used one is dropped first. If a path is given, each plan is
+    also added to the end of that file as a line of JSON, and the plans are loaded back from it when the cache is
+    created. The file is only written again in full on loading, to drop the plans that are no longer kept.
+    """
+    def __init__(self, size=settings.PLAN_CACHE_SIZE, path=settings.PLAN_CACHE_PATH):
+        self.size = size
+        self.path = path
+        self.plans = OrderedDict()  # Least recently used first.
+        self.hits = self.misses = 0
+
+        if self.path is not None and os.path.exists(self.path):
+            self.load()
+
+    @classmethod
+    def get_key(cls, obstacles: List[Obstacle]) -> str:
+        """
+        Get a hash that is the same for any two lists of the same obstacles, no matter what order they are in.
+        """
+        layout = sorted((x, y, direction.value, index) for x, y, direction, index in
+                        (obstacle.get_data() for obstacle in obstacles))
+        relevant = {name: getattr(settings, name) for name in KEY_SETTINGS}
+        text = json.dumps([PLAN_CACHE_VERSION, layout, relevant], sort_keys=True, default=str)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def get(self, obstacles: List[Obstacle]) -> Optional[List[str]]:
+        """
+        Get the commands planned for the specified obstacles, or None if they are not cached.
+        """
+        key = self.get_key(obstacles)
+        if key not in self.plans:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.plans.move_to_end(key)
+        return list(self.plans[key])  # Copied, so that the cached plan cannot be changed by the caller.
+
+    def put(self, obstacles: List[Obstacle], commands: List[str]):
+        """
+        Cache the commands planned for the specified obstacles.
+        """
+        key = self.get_key(obstacles)
+        self.plans[key] = list(commands)
+        self.plans.move_to_end(key)
+        while len(self.plans) > self.size:
+            self.plans.popitem(last=False)
+
+        if self.path is not None:
+            try:
+                with open(self.path, "a") as f:
+                    f.write(json.dumps([key, commands]) + "\n")
+            except OSError as e:
+                print(f"Could not save cached plan to {self.path}: {e}")
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                lines = f.readlines()
+        except OSError as e:
+            print(f"Could not load cached plans from {self.path}: {e}")
+            return
+        for line in lines:
+            try:
+                key, commands = json.loads(line)
+            except ValueError:
+                # Only the last line can be broken, if the process stopped while adding it.
+                continue
+            self.plans[key] = commands
+            self.plans.move_to_end(key)
+        while len(self.plans) > self.size:
+            self.plans.popitem(last=False)
+        print(f"Loaded {len(self.plans)} cached plans from {self.path}")
+
+        if len(lines) > len(self.plans):
+            self.save()
+
+    def save(self):
+        """
+        Write every kept plan to the file again, replacing what was there.
+        """
+        try:
+            write_atomically(self.path, "".join(json.dumps([key, commands]) + "\n"
+                                                for key, commands in self.plans.items()))
+        except OSError as e:
+            print(f"Could not save cached plans to {self.path}: {e}")
@@ -0,0 +1,111 @@
+import time
+from typing import List, Tuple
+
+from algorithm.entities.grid.grid import Grid
+from algorithm.entities.grid.obstacle import Obstacle
+from algorithm.entities.grid.position import RobotPosition
+from algorithm.entities.robot.brain.mod_a_star import ModifiedAStar
+
+# Grid used by the searches in a worker process, and the layout that it was built for. Only built again when a search
+# is for another layout.
+_worker_layout = None
+_worker_grid = None
+
+
+def _get_worker_grid(layout):
+    global _worker_layout, _worker_grid
+    if layout != _worker_layout:
+        obstacle_data, num_rows, num_cols = layout
+        _worker_grid = Grid([Obstacle(*params) for params in obstacle_data], num_rows, num_cols)
+        _worker_layout = layout
+    return _worker_grid
+
+
+def _sweep(layout, start, target_groups, wall_deadline=None):
+    # The deadline is sent as a time.time() value, as time.perf_counter() values cannot be compared across processes.
+    deadline = None if wall_deadline is None else time.perf_counter() + wall_deadline - time.time()
+    return ModifiedAStar(_get_worker_grid(layout), start).start_group_sweep_moves(target_groups, deadline)
+
+
+class PlannerPool:
+    """
+    Run many searches at the same time across a pool of processes.
+
+    Each worker builds its own copy of the grid the first time that it searches a layout, and shares it read-only with
+    every later search on that layout. Workers only send back states and move indices, and the commands are made from
+    PRIMITIVES in this process, so paths from a pool share the same command objects as any other path.
+
+    The pool is kept for as long as it is needed, as starting the workers costs more than most searches. Use
+    get_shared to get the pool shared by the whole process, or use a new pool as a context manager so that its worker
+    processes are cleaned up.
+    """
+    # Pool shared by the whole process. See get_shared.
+    shared = None
+
+    def __init__(self, workers=None):
+        """
+        workers -> Number of worker processes. None uses one process for each CPU core.
+        """
+        # Only imported here, as it is slow to import and most runs plan in a single process.
+        from concurrent.futures import ProcessPoolExecutor
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+
+    @classmethod
+    def get_shared(cls, workers=None):
+        """
+        Get the pool shared by the whole process, starting it if there is none with this number of workers yet.
+        """
+        if cls.shared is None or cls.shared.workers != workers:
+            if cls.shared is not None:
+                cls.shared.close()
+            cls.shared = cls(workers)
+        return cls.shared
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def sweep_all(self, grid: Grid, jobs: List[Tuple[RobotPosition, List[List[RobotPosition]]]], deadline=None):
+        """
+        Run ModifiedAStar.start_group_sweep on the grid for every (start, target groups) pair, returning the results in
+        the same order.
+
+        If a deadline (a time.perf_counter() value) is given, the result is None for every search that is not done by
+        then. Searches that have not started by then are not run, and the ones that are running stop themselves, so
+        the workers are free again for whatever uses the pool next.
+        """
+        from concurrent.futures import TimeoutError as FutureTimeoutError
+
+        layout = (tuple(obstacle.get_data() for obstacle in grid.obstacles), grid.num_rows, grid.num_cols)
+        wall_deadline = None if deadline is None else time.time() + deadline - time.perf_counter()
+        futures = [self.executor.submit(_sweep, layout, start, target_groups, wall_deadline)
+                   for start, target_groups in jobs]
+
+        results = []
+        for future in futures:
+            try:
+                sweep = future.result(None if deadline is None else max(0, deadline - time.perf_counter()))
+            except FutureTimeoutError:
+                # Searches that have not started yet are not run at all.
+                future.cancel()
+                results.append(None)
+                continue
+            if sweep is None:
+                # The search ran out of time in the worker.
+                results.append(None)
+                continue
+            legs = []
+            for result in sweep:
+                if result is None:
+                    legs.append(None)
+                    continue
+                goal_state, moves = result
+                legs.append((grid.lattice.get_position(goal_state), ModifiedAStar.get_move_commands(moves)))
+            results.append(legs)
+        return results
+
+    def close(self):
+        self.executor.shutdown()
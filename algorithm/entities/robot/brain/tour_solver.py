@@ -0,0 +1,210 @@
+import math
+import time
+from abc import ABC, abstractmethod
+from array import array
+from typing import List, Sequence
+
+from algorithm import settings
+
+
+class TourSolver(ABC):
+    """
+    Find the order in which the robot should visit the obstacles, given a cost matrix.
+
+    Row/column 0 of the cost matrix is the robot's starting position, and row/column i (i >= 1) is the i-th
+    obstacle. cost[i][j] is the cost of travelling from i to j. The tour starts at 0 and does not return to it.
+    """
+    # How far (as a fraction) the last tour found may be above the optimal tour. Exact solvers leave this at 0.
+    gap = 0
+
+    @abstractmethod
+    def solve(self, cost: Sequence[Sequence[float]]) -> List[int]:
+        """
+        Return the indices (into the cost matrix, so never 0) of the obstacles in the order they should be visited.
+        """
+        pass
+
+    @classmethod
+    def tour_cost(cls, cost: Sequence[Sequence[float]], tour: Sequence[int]) -> float:
+        """
+        Total cost of travelling from the start through all obstacles in the given order.
+        """
+        total = 0
+        prev = 0
+        for i in tour:
+            total += cost[prev][i]
+            prev = i
+        return total
+
+
+class HeldKarpSolver(TourSolver):
+    """
+    Exact tour solver using the Held-Karp bitmask dynamic programme.
+
+    Takes O(n^2 * 2^n) time and O(n * 2^n) memory, rather than the O(n!) of trying every permutation.
+    """
+    def __init__(self, max_obstacles=settings.TOUR_EXACT_MAX_OBSTACLES):
+        # The memory needed doubles with every extra obstacle, so we refuse to go past this limit.
+        self.max_obstacles = max_obstacles
+
+    def solve(self, cost):
+        n = len(cost) - 1
+        if n > self.max_obstacles:
+            raise ValueError(f"Held-Karp can only solve up to {self.max_obstacles} obstacles, got {n}!")
+        if n == 0:
+            return []
+
+        full = 1 << n
+        # best[mask * n + j] is the cost of the cheapest path from the start that visits exactly the obstacles
+        # in mask, ending at obstacle j. parent[...] stores the obstacle visited just before j on that path.
+        best = array('d', [math.inf]) * (full * n)
+        parent = array('b', [-1]) * (full * n)
+        for j in range(n):
+            best[(1 << j) * n + j] = cost[0][j + 1]
+
+        for mask in range(1, full):
+            base = mask * n
+            unvisited = [k for k in range(n) if not mask & (1 << k)]
+            for j in range(n):
+                curr = best[base + j]
+                if curr == math.inf:  # Also skips all j that are not in mask.
+                    continue
+                row = cost[j + 1]
+                for k in unvisited:
+                    new_cost = curr + row[k + 1]
+                    index = (mask | (1 << k)) * n + k
+                    if new_cost < best[index]:
+                        best[index] = new_cost
+                        parent[index] = j
+
+        # Find the best obstacle to end at, then walk back through the parents.
+        mask = full - 1
+        last = min(range(n), key=lambda j: best[mask * n + j])
+        tour = []
+        while last != -1:
+            tour.append(last + 1)
+            last, mask = parent[mask * n + last], mask & ~(1 << last)
+        tour.reverse()
+        return tour
+
+
+class HeuristicTourSolver(TourSolver):
+    """
+    Approximate tour solver for when there are too many obstacles to solve exactly.
+
+    Builds a tour greedily by always going to the nearest unvisited obstacle, then improves it with 2-opt
+    (reversing a segment of the tour) and Or-opt (moving a short segment elsewhere) until no move helps, or
+    until the iteration or time cap is hit.
+    """
+    def __init__(self,
+                 max_iterations=settings.TOUR_HEURISTIC_MAX_ITERATIONS,
+                 time_limit=settings.TOUR_HEURISTIC_TIME_LIMIT):
+        self.max_iterations = max_iterations
+        self.time_limit = time_limit
+
+        # Filled in after solving, so that callers can see how good the tour is.
+        self.lower_bound = 0
+        self.gap = 0
+
+    @classmethod
+    def nearest_neighbour(cls, cost):
+        tour = []
+        unvisited = set(range(1, len(cost)))
+        curr = 0
+        while unvisited:
+            curr = min(unvisited, key=cost[curr].__getitem__)
+            unvisited.remove(curr)
+            tour.append(curr)
+        return tour
+
+    @classmethod
+    def compute_lower_bound(cls, cost):
+        """
+        Get a lower bound on the cost of any tour.
+
+        Every obstacle is entered exactly once, so no tour can be cheaper than the sum of the cheapest way into
+        each obstacle. Likewise, the start and every obstacle except the last one are left exactly once.
+        """
+        n = len(cost) - 1
+        if n == 0:
+            return 0
+        cheapest_in = sum(min(cost[i][j] for i in range(n + 1) if i != j) for j in range(1, n + 1))
+        cheapest_out = [min(cost[i][j] for j in range(1, n + 1) if i != j) if n > 1 or i == 0 else 0
+                        for i in range(n + 1)]
+        return max(cheapest_in, sum(cheapest_out) - max(cheapest_out[1:]))
+
+    @classmethod
+    def two_opt(cls, cost, path):
+        """
+        Apply the first improving segment reversal found. Returns whether the path was improved.
+
+        path includes the start at index 0.
+        """
+        n = len(path) - 1
+        # Prefix sums of the edge costs going forwards and backwards along the path, so that the cost of a
+        # reversed segment can be found in O(1).
+        forward = [0] * (n + 1)
+        backward = [0] * (n + 1)
+        for k in range(n):
+            forward[k + 1] = forward[k] + cost[path[k]][path[k + 1]]
+            backward[k + 1] = backward[k] + cost[path[k + 1]][path[k]]
+
+        for i in range(1, n):
+            before = path[i - 1]
+            for j in range(i + 1, n + 1):
+                delta = (cost[before][path[j]] - cost[before][path[i]] +
+                         backward[j] - backward[i] - forward[j] + forward[i])
+                if j < n:
+                    after = path[j + 1]
+                    delta += cost[path[i]][after] - cost[path[j]][after]
+                if delta < -1e-9:
+                    path[i:j + 1] = path[i:j + 1][::-1]
+                    return True
+        return False
+
+    @classmethod
+    def or_opt(cls, cost, path, max_segment=3):
+        """
+        Apply the first improving move of a segment of up to max_segment obstacles to another place in the path.
+        Returns whether the path was improved.
+
+        path includes the start at index 0.
+        """
+        n = len(path) - 1
+        for length in range(1, max_segment + 1):
+            for i in range(1, n - length + 2):
+                j = i + length - 1  # Segment is path[i..j].
+                first, last, before = path[i], path[j], path[i - 1]
+                removed = cost[before][first]
+                if j < n:
+                    removed += cost[last][path[j + 1]] - cost[before][path[j + 1]]
+
+                for k in range(n + 1):  # Insert the segment after path[k].
+                    if i - 1 <= k <= j:
+                        continue
+                    added = cost[path[k]][first]
+                    if k < n:
+                        added += cost[last][path[k + 1]] - cost[path[k]][path[k + 1]]
+                    if added - removed < -1e-9:
+                        segment = path[i:j + 1]
+                        rest = path[:i] + path[j + 1:]
+                        insert_at = k + 1 if k < i else k + 1 - length
+                        path[:] = rest[:insert_at] + segment + rest[insert_at:]
+                        return True
+        return False
+
+    def solve(self, cost):
+        deadline = time.perf_counter() + self.time_limit
+        path = [0] + self.nearest_neighbour(cost)
+
+        iterations = 0
+        while iterations < self.max_iterations and time.perf_counter() < deadline:
+            iterations += 1
+            if not (self.two_opt(cost, path) or self.or_opt(cost, path)):
+                break
+
+        tour = path[1:]
+        self.lower_bound = self.compute_lower_bound(cost)
+        tour_cost = self.tour_cost(cost, tour)
+        self.gap = (tour_cost - self.lower_bound) / self.lower_bound if self.lower_bound > 0 else 0
+        return tour
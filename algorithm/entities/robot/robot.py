@@ -1,10 +1,11 @@
-import pygame
 import datetime
 
 from algorithm import settings
 from algorithm.entities.assets import colors
 from algorithm.entities.assets.direction import Direction
+from algorithm.entities.assets.images import get_pygame, load_image
 from algorithm.entities.commands.command import Command
+from algorithm.entities.commands.command_cursor import CommandCursor
 from algorithm.entities.commands.straight_command import StraightCommand
 from algorithm.entities.commands.turn_command import TurnCommand
 from algorithm.entities.grid.position import RobotPosition
@@ -24,12 +25,10 @@ class Robot:
 
         self.brain = Brain(self, grid)
 
-        self.__image = pygame.transform.scale(pygame.image.load("entities/assets/left-arrow.png"),
-                                              (settings.ROBOT_LENGTH / 2, settings.ROBOT_LENGTH / 2))
-
         self.path_hist = []  # Stores the history of the path taken by the robot.
 
         self.__current_command = 0  # Index of the current command being executed.
+        self.__cursor = None  # Progress of carrying out the current command.
         self.printed = False  # Never printed total time before.
 
     def get_current_pos(self):
@@ -74,20 +73,28 @@ class Robot:
         StraightCommand(dist).apply_on_pos(self.pos)
 
     def draw_simple_hamiltonian_path(self, screen):
+        pygame = get_pygame()
+
         prev = self._start_copy.xy_pygame()
-        for obs in self.brain.simple_hamiltonian:
-            target = obs.get_robot_target_pos().xy_pygame()
+        # Each obstacle may be scanned from any of its target poses, so the line goes to the pose that was planned.
+        for _, _, end, _ in self.brain.route:
+            target = end.xy_pygame()
             pygame.draw.line(screen, colors.DARK_GREEN, prev, target)
             prev = target
 
     def draw_self(self, screen):
+        pygame = get_pygame()
+
         # The arrow to represent the direction of the robot.
-        rot_image = pygame.transform.rotate(self.__image, -(90 - self.pos.angle))
+        image = load_image("left-arrow.png", (settings.ROBOT_LENGTH / 2, settings.ROBOT_LENGTH / 2))
+        rot_image = pygame.transform.rotate(image, -(90 - self.pos.angle))
         rect = rot_image.get_rect()
         rect.center = self.pos.xy_pygame()
         screen.blit(rot_image, rect)
 
     def draw_historic_path(self, screen):
+        pygame = get_pygame()
+
         for dot in self.path_hist:
             pygame.draw.circle(screen, colors.BLACK, dot, 3)
 
@@ -118,13 +125,16 @@ class Robot:
 
         # If not, the first command in the list is always the command to execute.
         command: Command = self.brain.commands[self.__current_command]
-        command.process_one_tick(self)
+        if self.__cursor is None:
+            self.__cursor = CommandCursor(command)
+        self.__cursor.process_one_tick(self)
         # If there are no more ticks to do, then we can assume that we have
         # successfully completed this command, and so we can remove it.
         # The next time this method is run, then we will process the next command in the list.
-        if command.ticks <= 0:
+        if self.__cursor.done():
             print(f"Finished processing {command}, {self.pos}")
             self.__current_command += 1
+            self.__cursor = None
             if self.__current_command == len(self.brain.commands) and not self.printed:
                 total_time = 0
                 for command in self.brain.commands:
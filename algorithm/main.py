@@ -3,11 +3,11 @@ import time
 from typing import List
 
 from algorithm import settings
-from algorithm.app import AlgoSimulator, AlgoMinimal
+from algorithm.app import AlgoMinimal
 from algorithm.entities.assets.direction import Direction
 from algorithm.entities.connection.rpi_client import RPiClient
-from algorithm.entities.connection.rpi_server import RPiServer
 from algorithm.entities.grid.obstacle import Obstacle
+from algorithm.entities.robot.brain.plan_cache import PlanCache
 
 
 def parse_obstacle_data(data) -> List[Obstacle]:
@@ -26,12 +26,14 @@ def run_simulator():
     # (x-coordinate, y-coordinate, Direction)
     obstacles = [[105, 75, 180, 0], [135, 25, 0, 1], [195, 95, 180, 2], [175, 185, -90, 3], [75, 125, 90, 4], [15, 185, -90, 5]]
     obs = parse_obstacle_data(obstacles)
+    # Only imported here, so that running without the simulator never needs pygame.
+    from algorithm.simulator import AlgoSimulator
     app = AlgoSimulator(obs)
     app.init()
     app.execute()
 
 
-def run_minimal(also_run_simulator):
+def connect_to_rpi():
     # Create a client to connect to the RPi.
     print(f"Attempting to connect to {settings.RPI_HOST}:{settings.RPI_PORT}")
     client = RPiClient(settings.RPI_HOST, settings.RPI_PORT)
@@ -46,45 +48,72 @@ def run_minimal(also_run_simulator):
             client.close()
             sys.exit(1)
     print("Connected to RPi!\n")
+    return client
 
-    print("Waiting to receive obstacle data from RPi...")
-    # Create a server to receive information from the RPi.
-    server = RPiServer(settings.PC_HOST, settings.PC_PORT)
-    # Wait for the RPi to connect to the PC.
-    try:
-        server.start()
-    except OSError or KeyboardInterrupt as e:
-        print(e)
-        server.close()
-        client.close()
-        sys.exit(1)
 
-    # At this point, both the RPi and the PC are connected to each other.
-    # Create a synchronous call to wait for RPi data.
-    obstacle_data: list = server.receive_data()
-    server.close()
+def serve_layout(client: RPiClient, also_run_simulator, plan_cache: PlanCache = None):
+    """
+    Wait for the RPi to send an obstacle layout, and send the commands for it back over the same connection.
+
+    Returns False if the RPi closed the connection instead of sending a layout.
+    """
+    print("Waiting to receive obstacle data from RPi...")
+    obstacle_data = client.receive_obstacles()
+    if obstacle_data is None:
+        print("RPi closed the connection.")
+        return False
     print("Got data from RPi:")
     print(obstacle_data)
 
     obstacles = parse_obstacle_data(obstacle_data)
     if also_run_simulator:
+        from algorithm.simulator import AlgoSimulator
         app = AlgoSimulator(obstacles)
         app.init()
         app.execute()
-    app = AlgoMinimal(obstacles)
-    app.init()
-    app.execute()
+
+    # Reuse the commands if this layout has been planned before.
+    commands = plan_cache.get(obstacles) if plan_cache is not None else None
+    if commands is not None:
+        print("Found cached path for this layout!")
+    else:
+        app = AlgoMinimal(obstacles)
+        app.init()
+        app.execute()
+        commands = app.robot.convert_all_commands()
+        if plan_cache is not None and app.robot.brain.complete:
+            plan_cache.put(obstacles, commands)
+        elif plan_cache is not None:
+            # Planning ran out of time, so the layout is planned again if it is sent again.
+            print("Not caching the path, as planning ran out of time.")
 
     # Send the list of commands over.
     print("Sending list of commands to RPi...")
-    commands = app.robot.convert_all_commands()
-    client.send_message(commands)
-    client.close()
+    client.send_commands(commands)
+    return True
+
+
+def run_minimal(also_run_simulator, plan_cache: PlanCache = None):
+    client = connect_to_rpi()
+    try:
+        serve_layout(client, also_run_simulator, plan_cache)
+    finally:
+        client.close()
 
 
 def run_rpi():
+    # Shared by every run, as the RPi may send the same layout again.
+    plan_cache = PlanCache()
     while True:
-        run_minimal(False)
+        # Keep the connection open for as many layouts as the RPi sends, and only connect again once it is closed.
+        client = connect_to_rpi()
+        try:
+            while serve_layout(client, False, plan_cache):
+                pass
+        except (OSError, ValueError) as e:
+            print(e)
+        finally:
+            client.close()
         time.sleep(5)
 
 
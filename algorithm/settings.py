@@ -1,4 +1,4 @@
-import socket
+import os
 
 # PyGame settings
 SCALING_FACTOR = 6
@@ -9,10 +9,6 @@ WINDOW_SIZE = 1200, 1200
 RPI_HOST: str = "192.168.8.8"
 RPI_PORT: int = 4160
 
-# Connection to PC
-PC_HOST: str = socket.gethostbyname(socket.gethostname())
-PC_PORT: int = 4161
-
 # Robot Attributes
 ROBOT_LENGTH = 20 * SCALING_FACTOR
 ROBOT_TURN_RADIUS = 20 * SCALING_FACTOR
@@ -30,9 +26,64 @@ GRID_NUM_GRIDS = GRID_LENGTH // GRID_CELL_LENGTH
 # Obstacle Attributes
 OBSTACLE_LENGTH = 10 * SCALING_FACTOR
 OBSTACLE_SAFETY_WIDTH = ROBOT_SAFETY_DISTANCE // 3 * 4  # With respect to the center of the obstacle
+# Other places that the robot can scan an obstacle's image from, if its usual target is hard to get to. Each
+# combination of a distance further away from the obstacle and a sideways offset gives one place.
+OBSTACLE_TARGET_EXTRA_DISTANCES = (0, 10 * SCALING_FACTOR)
+OBSTACLE_TARGET_SIDE_OFFSETS = (0, -10 * SCALING_FACTOR, 10 * SCALING_FACTOR)
 
 # Path Finding Attributes
 PATH_TURN_COST = 999 * ROBOT_SPEED_PER_SECOND * ROBOT_TURN_RADIUS
-# NOTE: Higher number == Lower Granularity == Faster Checking.
-# Must be an integer more than 0! Number higher than 3 not recommended.
-PATH_TURN_CHECK_GRANULARITY = 1
+# Cost added to getting to an obstacle's target pose for each place that it is down the obstacle's order of
+# preference. 0 takes whichever pose is quickest to get to. Higher == Keeps to the preferred poses more, for when they
+# scan better, at the cost of a longer run (about 12% longer at half of PATH_TURN_COST).
+PATH_TARGET_RANK_PENALTY = 0
+# Number of goals whose heuristic tables are kept for each obstacle layout. Each table has one float for every search
+# state (about 13KB for the default arena).
+PATH_HEURISTIC_CACHE_SIZE = 32
+# A heuristic table is only built for a goal once it has been searched for this many times, as building one searches
+# the whole lattice. Searches for other goals use a cheap estimate instead.
+PATH_HEURISTIC_TABLE_MIN_QUERIES = 2
+# Anytime planning starts with the heuristic inflated by the initial weight, and lowers it by the step after every
+# search until it reaches 1. Higher initial weight == Faster first path, but possibly worse.
+PATH_ANYTIME_INITIAL_WEIGHT = 3
+PATH_ANYTIME_WEIGHT_STEP = 0.5
+# Seconds that the planner has to plan the path when sending it to the RPi. Legs from where there was no time to
+# search are estimated for the visiting order, and each leg then gets an equal share of the time left to improve its
+# path. None plans every leg exactly.
+PATH_PLANNING_TIME_LIMIT = 5
+# Share of the time left spent on each step of choosing the visiting order, which are searching the legs between
+# obstacles and then solving the tour. The rest is kept for planning the legs in that order.
+PATH_PLANNING_ORDER_SHARE = 0.5
+# Hierarchical planning first plans over square blocks with this many cells a side, then plans in full detail only on
+# the cells within this many blocks of that path.
+PATH_COARSE_FACTOR = 8
+PATH_CORRIDOR_WIDTH = 1
+# Grids with at least this many cells plan legs to a single pose hierarchically, as searching the whole of them is
+# slow. This only applies to legs planned again when an obstacle is replaced, not to the first plan. None never plans
+# them hierarchically.
+PATH_HIERARCHICAL_MIN_CELLS = 10000
+# Folder that the movement tables, which do not depend on the obstacles, are saved to after they are first built.
+# They are built again whenever the settings that they depend on change. None builds them every time instead.
+PATH_PRIMITIVE_TABLES_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+                                         "mdp-algorithm")
+# Number of processes used to plan paths at the same time. 1 plans everything in this process, and None uses one
+# process for each CPU core. This only pays off with spare cores: on a single core, the searches for 30 obstacles on a
+# 60 x 60 grid took about 1.1s either way, and 1.3-1.7s for the first layout, while the workers build their grids.
+PATH_PLANNING_WORKERS = 1
+# With fewer searches than this, planning them in this process is faster than sending them to the worker processes.
+PATH_PLANNING_MIN_POOL_SEARCHES = 16
+
+# Tour Solving Attributes
+# Up to this many obstacles, the visiting order is solved exactly. Above it, a faster heuristic is used instead.
+# NOTE: The exact solver needs memory that doubles with every obstacle (about 4MB at 15 obstacles).
+TOUR_EXACT_MAX_OBSTACLES = 15
+# Caps for the heuristic solver. Lower values == Faster, but possibly worse tours.
+TOUR_HEURISTIC_MAX_ITERATIONS = 1000
+TOUR_HEURISTIC_TIME_LIMIT = 1  # In seconds.
+
+# Plan Cache Attributes
+# Number of obstacle layouts whose commands are kept, so that a layout sent again is not planned again.
+PLAN_CACHE_SIZE = 64
+# File that the cached plans are also saved to, so that they survive restarts. None keeps them in memory only.
+PLAN_CACHE_PATH = None
+
@@ -0,0 +1,10 @@
+import pytest
+
+from algorithm import settings
+
+
+@pytest.fixture(autouse=True)
+def primitive_tables_dir(tmp_path, monkeypatch):
+    # Saved tables go to a folder of the test's own, rather than the user's cache.
+    monkeypatch.setattr(settings, "PATH_PRIMITIVE_TABLES_DIR", str(tmp_path))
+    return tmp_path
@@ -0,0 +1,85 @@
+import json
+
+from algorithm import main, settings
+from algorithm.entities.assets.direction import Direction
+from algorithm.entities.grid.obstacle import Obstacle
+from algorithm.entities.robot.brain.plan_cache import PlanCache
+
+LAYOUT = [[105, 75, 180, 0], [135, 25, 0, 1], [195, 95, 180, 2], [175, 185, -90, 3]]
+
+
+def make_layout(index):
+    return [Obstacle(25 + 10 * index, 155, Direction.BOTTOM, 0), Obstacle(155, 45, Direction.LEFT, 1)]
+
+
+def test_key_ignores_obstacle_order():
+    obstacles = main.parse_obstacle_data(LAYOUT)
+    assert PlanCache.get_key(obstacles) == PlanCache.get_key(obstacles[::-1])
+    moved = main.parse_obstacle_data([[115, 75, 180, 0]] + LAYOUT[1:])
+    assert PlanCache.get_key(obstacles) != PlanCache.get_key(moved)
+
+
+def test_least_recently_used_is_dropped():
+    cache = PlanCache(size=2, path=None)
+    cache.put(make_layout(0), ["f0010"])
+    cache.put(make_layout(1), ["f0020"])
+    assert cache.get(make_layout(0)) == ["f0010"]
+    cache.put(make_layout(2), ["f0030"])
+
+    assert cache.get(make_layout(1)) is None
+    assert cache.get(make_layout(0)) == ["f0010"]
+    assert cache.get(make_layout(2)) == ["f0030"]
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_plans_are_reloaded_from_file(tmp_path):
+    path = str(tmp_path / "plans.jsonl")
+    cache = PlanCache(size=2, path=path)
+    for index in range(3):
+        cache.put(make_layout(index), [f"f00{index}0"])
+    with open(path) as f:
+        assert len(f.readlines()) == 3
+
+    loaded = PlanCache(size=2, path=path)
+    assert loaded.get(make_layout(0)) is None
+    assert loaded.get(make_layout(1)) == ["f0010"]
+    assert loaded.get(make_layout(2)) == ["f0020"]
+    # The dropped plan was left out when the file was written again on loading.
+    with open(path) as f:
+        assert [json.loads(line)[1] for line in f] == [["f0010"], ["f0020"]]
+
+
+def test_broken_last_line_is_skipped(tmp_path):
+    path = str(tmp_path / "plans.jsonl")
+    PlanCache(path=path).put(make_layout(0), ["f0010"])
+    with open(path, "a") as f:
+        f.write('["abc", ["f00')
+
+    loaded = PlanCache(path=path)
+    assert loaded.get(make_layout(0)) == ["f0010"]
+    with open(path) as f:
+        assert len(f.readlines()) == 1
+
+
+class FakeClient:
+    def __init__(self, obstacle_data):
+        self.obstacle_data = obstacle_data
+        self.sent = []
+
+    def receive_obstacles(self):
+        return self.obstacle_data
+
+    def send_commands(self, commands):
+        self.sent.append(commands)
+
+
+def test_only_complete_plans_are_cached(monkeypatch):
+    cache = PlanCache(path=None)
+    client = FakeClient(LAYOUT)
+    monkeypatch.setattr(settings, "PATH_PLANNING_TIME_LIMIT", 0)
+    assert main.serve_layout(client, False, cache)
+    assert client.sent and not cache.plans
+
+    monkeypatch.setattr(settings, "PATH_PLANNING_TIME_LIMIT", None)
+    assert main.serve_layout(client, False, cache)
+    assert cache.get(main.parse_obstacle_data(LAYOUT)) == client.sent[-1]
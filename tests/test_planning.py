@@ -0,0 +1,300 @@
+import itertools
+import math
+import random
+import time
+
+import pytest
+
+from algorithm import settings
+from algorithm.app import AlgoMinimal
+from algorithm.entities.assets.direction import Direction
+from algorithm.entities.commands.scan_command import ScanCommand
+from algorithm.entities.commands.turn_command import TurnCommand
+from algorithm.entities.grid.arc import Arc
+from algorithm.entities.grid.grid import Grid
+from algorithm.entities.grid.obstacle import Obstacle
+from algorithm.entities.grid.position import RobotPosition
+from algorithm.entities.grid.state_lattice import StateLattice
+from algorithm.entities.robot.brain.hierarchical_a_star import HierarchicalAStar
+from algorithm.entities.robot.brain.mod_a_star import ModifiedAStar
+from algorithm.entities.robot.brain.planner_pool import PlannerPool
+from algorithm.entities.robot.brain.tour_solver import HeldKarpSolver, TourSolver
+from algorithm.entities.robot.robot import Robot
+
+DIRECTIONS = (Direction.RIGHT, Direction.TOP, Direction.LEFT, Direction.BOTTOM)
+
+
+def make_obstacles(rnd, count):
+    """
+    Obstacles on random cells of the arena, away from where the robot starts.
+    """
+    cells = rnd.sample([(x, y) for x in range(1, 19) for y in range(1, 19) if x > 4 or y > 4], count)
+    return [Obstacle(10 * x + 5, 10 * y + 5, rnd.choice(DIRECTIONS), index) for index, (x, y) in enumerate(cells)]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_held_karp_matches_brute_force(seed):
+    rnd = random.Random(seed)
+    n = rnd.randint(1, 7)
+    cost = [[0 if i == j else rnd.randint(1, 100) for j in range(n + 1)] for i in range(n + 1)]
+
+    tour = HeldKarpSolver().solve(cost)
+    assert sorted(tour) == list(range(1, n + 1))
+    best = min(TourSolver.tour_cost(cost, order) for order in itertools.permutations(range(1, n + 1)))
+    assert TourSolver.tour_cost(cost, tour) == best
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_arc_within_box_matches_dense_sampling(seed):
+    rnd = random.Random(seed)
+    arc = Arc(rnd.uniform(-50, 50), rnd.uniform(-50, 50), rnd.uniform(5, 60),
+              rnd.uniform(-math.pi, math.pi), rnd.uniform(-2 * math.pi, 2 * math.pi))
+    x_min, y_min = rnd.uniform(-100, 80), rnd.uniform(-100, 80)
+    x_max, y_max = x_min + rnd.uniform(1, 80), y_min + rnd.uniform(1, 80)
+
+    samples = 5000
+    points = [arc.point_at(i / samples) for i in range(samples + 1)]
+    # Any point of the arc is within this distance of a sample.
+    step = arc.radius * abs(arc.sweep) / samples
+
+    inside = arc.check_within_box(x_min, y_min, x_max, y_max)
+    if any(x_min + 1e-6 < x < x_max - 1e-6 and y_min + 1e-6 < y < y_max - 1e-6 for x, y in points):
+        assert inside
+    if inside:
+        assert any(x_min - step < x < x_max + step and y_min - step < y < y_max + step for x, y in points)
+
+    bounds = arc.get_bounds()
+    assert all(bounds[0] - 1e-9 <= x <= bounds[2] + 1e-9 and bounds[1] - 1e-9 <= y <= bounds[3] + 1e-9
+               for x, y in points)
+    assert min(x for x, _ in points) - bounds[0] < step and bounds[2] - max(x for x, _ in points) < step
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_lattice_update_matches_fresh_lattice(seed):
+    rnd = random.Random(seed)
+    obstacles = make_obstacles(rnd, 7)
+    grid = Grid(obstacles[:6])
+    lattice = grid.lattice
+    goals = rnd.sample(range(lattice.num_states), 3)
+    for goal in goals:
+        lattice.get_cost_to_go(goal)
+
+    grid.remove_obstacle(obstacles[rnd.randrange(6)])
+    grid.add_obstacle(obstacles[6])
+
+    fresh = Grid(list(grid.obstacles)).lattice
+    assert lattice.successors == fresh.successors
+    for goal in goals:
+        # The cached tables were repaired, not built again.
+        assert lattice.cost_to_go_cache[goal] == fresh.get_cost_to_go(goal)
+
+
+@pytest.fixture
+def planner_pool(monkeypatch):
+    monkeypatch.setattr(settings, "PATH_PLANNING_WORKERS", 2)
+    monkeypatch.setattr(settings, "PATH_PLANNING_MIN_POOL_SEARCHES", 1)
+    yield
+    if PlannerPool.shared is not None:
+        PlannerPool.shared.close()
+        PlannerPool.shared = None
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_replace_obstacle_with_planner_pool(planner_pool, seed):
+    rnd = random.Random(seed)
+    obstacles = make_obstacles(rnd, 6)
+    app = AlgoMinimal(obstacles[:5])
+    app.execute()
+    brain = app.robot.brain
+    assert PlannerPool.shared is not None
+    lattice = brain.grid.lattice
+    for _, start, end, leg_commands in brain.route:
+        # Legs from the pool are matched move by move, as replace_obstacle does to keep them.
+        assert lattice.get_end_state(lattice.get_state(start), leg_commands) == lattice.get_state(end)
+
+    old = brain.route[-1][0]
+    new = Obstacle(*obstacles[5].get_data()[:3], old.index)
+    pos = app.robot.pos.copy()
+    commands = brain.replace_obstacle(old, new)
+    for command in commands:
+        if isinstance(command, ScanCommand):
+            obstacle = next(obstacle for obstacle in brain.grid.obstacles if obstacle.index == command.obj_index)
+            assert any(pose.xy_dir() == (round(pos.x), round(pos.y), pos.direction)
+                       for pose in obstacle.get_robot_target_poses())
+        else:
+            command.apply_on_pos(pos)
+
+
+def test_planner_pool_stops_sweeps_at_deadline(planner_pool):
+    grid = Grid(make_obstacles(random.Random(0), 8))
+    start = RobotPosition(1.5 * settings.GRID_CELL_LENGTH, 1.5 * settings.GRID_CELL_LENGTH, Direction.TOP)
+    jobs = [(start, [obstacle.get_robot_target_poses() for obstacle in grid.obstacles])] * 4
+    pool = PlannerPool.get_shared(settings.PATH_PLANNING_WORKERS)
+
+    assert pool.sweep_all(grid, jobs, time.perf_counter()) == [None] * len(jobs)
+    # Nothing left over from the searches that ran out of time.
+    swept = ModifiedAStar(grid, start).start_group_sweep(jobs[0][1])
+    for legs in pool.sweep_all(grid, jobs):
+        assert [None if leg is None else (leg[0].xy_dir(), path_weight(leg[1])) for leg in legs] == \
+            [None if leg is None else (leg[0].xy_dir(), path_weight(leg[1])) for leg in swept]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_hierarchical_path_is_valid_and_corridor_limited(seed):
+    rnd = random.Random(seed)
+    size = 40
+    cells = rnd.sample([(x, y) for x in range(2, size - 2) for y in range(2, size - 2)], 60)
+    grid = Grid([Obstacle(10 * x + 5, 10 * y + 5, rnd.choice(DIRECTIONS), index)
+                 for index, (x, y) in enumerate(cells)], size, size)
+    start, end = rnd.sample([pose for obstacle in grid.obstacles for pose in obstacle.get_robot_target_poses()
+                             if grid.check_valid_position(pose)], 2)
+
+    astar = HierarchicalAStar(grid, start, end, factor=4)
+    corridor = StateLattice(grid, astar.compute_corridor(astar.find_block_path() or []))
+    assert len(corridor.successors) == 4 * len(corridor.cells)
+    if astar.start_astar() is None:
+        assert ModifiedAStar(grid, start, end).start_astar() is None
+        return
+    pos = start.copy()
+    for command in astar.commands:
+        command.apply_on_pos(pos)
+        assert grid.check_valid_position(pos)
+    assert pos.xy_dir() == end.xy_dir()
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("rank_penalty", [0, settings.PATH_TURN_COST // 2, 10 * settings.PATH_TURN_COST])
+def test_group_sweep_counts_rank_penalty(seed, rank_penalty):
+    rnd = random.Random(seed)
+    grid = Grid(make_obstacles(rnd, 6))
+    lattice = grid.lattice
+    start = RobotPosition(1.5 * settings.GRID_CELL_LENGTH, 1.5 * settings.GRID_CELL_LENGTH, Direction.TOP)
+    start_state = lattice.get_state(start)
+    groups = [[lattice.get_state(pose) for pose in obstacle.get_robot_target_poses()] for obstacle in grid.obstacles]
+
+    reached, _ = ModifiedAStar(grid, start).search(groups, use_heuristic=False, rank_penalty=rank_penalty)
+    for group, goal_state in zip(groups, reached):
+        costs = [math.inf if state is None else lattice.get_cost_to_go(state)[start_state] + rank * rank_penalty
+                 for rank, state in enumerate(group)]
+        if goal_state is None:
+            assert min(costs) == math.inf
+        else:
+            assert costs[group.index(goal_state)] == min(costs)
+
+
+def path_weight(commands):
+    return sum(settings.PATH_TURN_COST if isinstance(command, TurnCommand) else abs(command.dist)
+               for command in commands)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_astar_builds_heuristic_table_only_when_repeated(seed):
+    rnd = random.Random(seed)
+    grid = Grid(make_obstacles(rnd, 8))
+    lattice = grid.lattice
+    poses = [pose for obstacle in grid.obstacles for pose in obstacle.get_robot_target_poses()
+             if grid.check_valid_position(pose)]
+    start, end = rnd.sample(poses, 2)
+    swept = ModifiedAStar(grid, start).start_group_sweep([[end]])[0]
+
+    for table_cached in (False, True):
+        astar = ModifiedAStar(grid, start, end)
+        found = astar.start_astar()
+        if swept is None:
+            assert found is None
+            continue
+        assert lattice.get_state(end) in lattice.cost_to_go_cache if table_cached else not lattice.cost_to_go_cache
+        assert path_weight(astar.commands) == path_weight(swept[1])
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_bidirectional_astar_matches_astar(seed):
+    rnd = random.Random(seed)
+    grid = Grid(make_obstacles(rnd, 8))
+    lattice = grid.lattice
+    poses = [pose for obstacle in grid.obstacles for pose in obstacle.get_robot_target_poses()
+             if grid.check_valid_position(pose)]
+    start, end = rnd.sample(poses, 2)
+
+    astar, bidirectional = ModifiedAStar(grid, start, end), ModifiedAStar(grid, start, end)
+    found = astar.start_astar()
+    found_bidirectional = bidirectional.start_astar(bidirectional=True)
+    if found is None:
+        assert found_bidirectional is None
+        return
+    assert found_bidirectional.xy_dir() == found.xy_dir() == end.xy_dir()
+    assert path_weight(bidirectional.commands) == path_weight(astar.commands)
+    # The moves really do lead from the start to the end.
+    assert lattice.get_end_state(lattice.get_state(start), bidirectional.commands) == lattice.get_state(end)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_replace_obstacle_reuses_repaired_tables(monkeypatch, seed):
+    monkeypatch.setattr(settings, "PATH_HEURISTIC_TABLE_MIN_QUERIES", 1)
+    rnd = random.Random(seed)
+    obstacles = make_obstacles(rnd, 8)
+    app = AlgoMinimal(obstacles[:6])
+    app.execute()
+    brain = app.robot.brain
+    lattice = brain.grid.lattice
+    assert not lattice.cost_to_go_cache
+
+    old = brain.route[0][0]
+    first = Obstacle(*obstacles[6].get_data()[:3], old.index)
+    brain.replace_obstacle(old, first)
+    tables = dict(lattice.cost_to_go_cache)
+    assert tables
+
+    repaired, found = [], []
+    repair_cost_to_go, find_cost_to_go = StateLattice.repair_cost_to_go, StateLattice.find_cost_to_go
+    monkeypatch.setattr(StateLattice, "repair_cost_to_go",
+                        lambda self, cost, *args: repaired.append(cost) or repair_cost_to_go(self, cost, *args))
+    monkeypatch.setattr(StateLattice, "find_cost_to_go",
+                        lambda self, goal_state: found.append(find_cost_to_go(self, goal_state)) or found[-1])
+    brain.replace_obstacle(first, Obstacle(*obstacles[7].get_data()[:3], old.index))
+
+    fresh = Grid(list(brain.grid.obstacles)).lattice
+    for goal_state, cost in tables.items():
+        # Repaired in place rather than built again, and still exact.
+        assert lattice.cost_to_go_cache[goal_state] is cost
+        assert any(table is cost for table in repaired)
+        assert cost == fresh.get_cost_to_go(goal_state)
+    assert any(table is cost for table in found for cost in tables.values())
+
+
+@pytest.mark.parametrize("seed", range(2))
+def test_plan_path_keeps_to_time_limit(seed):
+    rnd = random.Random(seed)
+    size = 40
+    cells = rnd.sample([(x, y) for x in range(2, size - 2) for y in range(2, size - 2) if x > 6 or y > 6], 25)
+    grid = Grid([Obstacle(10 * x + 5, 10 * y + 5, rnd.choice(DIRECTIONS), index)
+                 for index, (x, y) in enumerate(cells)], size, size)
+    robot = Robot(grid)
+    lattice = grid.lattice
+    time_limit = 0.3
+
+    start_time = time.perf_counter()
+    robot.brain.plan_path(start_time + time_limit)
+    # Legs left once the time is up are found greedily, which takes a little longer.
+    assert time.perf_counter() - start_time < time_limit + 0.2
+    assert robot.brain.route
+    for _, start, end, leg_commands in robot.brain.route:
+        assert lattice.get_end_state(lattice.get_state(start), leg_commands) == lattice.get_state(end)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_plan_leg_improves_path_with_time_to_spare(seed):
+    rnd = random.Random(seed)
+    grid = Grid(make_obstacles(rnd, 6))
+    brain = Robot(grid).brain
+    targets = brain.compute_reachable_obstacles()
+    if not targets:
+        return
+    obstacle = rnd.choice(targets)
+    swept = ModifiedAStar(grid, brain.robot.pos).start_group_sweep([brain.target_poses[obstacle]])[0]
+
+    end, leg_commands = brain.plan_leg(brain.robot.pos, obstacle, time.perf_counter() + 10, legs_left=2)
+    # The improvement loop ran all the way down to the cheapest path.
+    assert brain.bounds[obstacle] == 1
+    assert any(end.xy_dir() == pose.xy_dir() for pose in brain.target_poses[obstacle])
+    assert path_weight(leg_commands) == path_weight(swept[1])
@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+from algorithm.entities.grid import primitive_tables
+from algorithm.entities.grid.grid import Grid
+from algorithm.entities.grid.primitive_tables import PrimitiveTables
+
+NUM_ROWS, NUM_COLS = 20, 20
+
+
+@pytest.fixture
+def moves(monkeypatch):
+    moves = Grid([]).lattice.moves
+    # Start each test without the tables that this process already has.
+    monkeypatch.setattr(PrimitiveTables, "loaded", dict())
+    return moves
+
+
+def test_tables_round_trip_through_mmap(moves, tmp_path):
+    key = PrimitiveTables.get_key(moves)
+    built = PrimitiveTables.build(key, moves, NUM_ROWS, NUM_COLS)
+    path = str(tmp_path / "tables.bin")
+    built.save(path)
+
+    loaded = PrimitiveTables.load(path, key, NUM_ROWS, NUM_COLS)
+    assert isinstance(loaded.border_masks, memoryview)
+    assert bytes(loaded.border_masks) == built.border_masks
+    assert loaded.swept_cells == built.swept_cells
+
+
+def test_tables_built_for_something_else_are_rejected(moves, tmp_path, monkeypatch):
+    key = PrimitiveTables.get_key(moves)
+    path = str(tmp_path / "tables.bin")
+    PrimitiveTables.build(key, moves, NUM_ROWS, NUM_COLS).save(path)
+
+    assert PrimitiveTables.load(path, bytes(32), NUM_ROWS, NUM_COLS) is None
+    assert PrimitiveTables.load(path, key, NUM_ROWS, NUM_COLS + 1) is None
+    monkeypatch.setattr(primitive_tables, "TABLES_VERSION", primitive_tables.TABLES_VERSION + 1)
+    assert PrimitiveTables.load(path, key, NUM_ROWS, NUM_COLS) is None
+
+
+def test_truncated_file_is_built_again(moves, primitive_tables_dir):
+    key = PrimitiveTables.get_key(moves)
+    built = PrimitiveTables.build(key, moves, NUM_ROWS, NUM_COLS)
+    path = PrimitiveTables.get_path(NUM_ROWS, NUM_COLS)
+    assert os.path.dirname(path) == str(primitive_tables_dir)
+    built.save(path)
+    size = os.path.getsize(path)
+    with open(path, "r+b") as f:
+        f.truncate(size - 1)
+
+    tables = PrimitiveTables.get(moves, NUM_ROWS, NUM_COLS)
+    assert bytes(tables.border_masks) == built.border_masks
+    # The broken file was replaced by a whole one.
+    assert os.path.getsize(path) == size
+    assert PrimitiveTables.load(path, key, NUM_ROWS, NUM_COLS) is not None
@@ -0,0 +1,31 @@
+import socket
+
+import pytest
+
+from algorithm.entities.connection import protocol
+from algorithm.entities.connection.protocol import Connection
+
+
+def test_commands_round_trip():
+    left, right = socket.socketpair()
+    with left, right:
+        Connection(left).send_commands(["f0090", "R0090", "s0003"])
+        assert Connection(right).receive_commands() == [("f", 90), ("R", 90), ("s", 3)]
+
+
+def test_partial_record_is_rejected():
+    left, right = socket.socketpair()
+    with left, right:
+        Connection(left).send(protocol.MESSAGE_OBSTACLES, protocol.pack_obstacles([[105, 75, 180, 0]])[:-1])
+        with pytest.raises(ValueError):
+            Connection(right).receive_obstacles()
+
+
+def test_long_message_is_rejected():
+    left, right = socket.socketpair()
+    with left, right:
+        left.sendall(protocol.HEADER.pack(protocol.MESSAGE_COMMANDS, protocol.MAX_MESSAGE_LENGTH + 1))
+        connection = Connection(right)
+        with pytest.raises(ValueError):
+            connection.receive_commands()
+        assert len(connection.buffer) < protocol.MAX_MESSAGE_LENGTH